@@ -0,0 +1,83 @@
+"""Тесты HTTP-клиентов Parser Service."""
+
+import dataclasses
+import socket
+import threading
+import unittest
+from typing import Any
+from unittest import mock
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service import api_clients
+from valutatrade_hub.parser_service.api_clients import (
+    BaseApiClient,
+    build_session,
+)
+
+
+class SilentServer:
+    """TCP-сервер, который принимает соединения и не отвечает."""
+
+    def __init__(self) -> None:
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        self.connections: list[socket.socket] = []
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+
+    def close(self) -> None:
+        self.sock.close()
+        for conn in self.connections:
+            conn.close()
+
+
+class RawClient(BaseApiClient):
+    """Клиент, выполняющий запрос к произвольному URL."""
+
+    def fetch_rates(self) -> dict[str, float]:
+        return {}
+
+    def get(self, url: str) -> dict[str, Any]:
+        return self._make_request(url)
+
+
+class ReadTimeoutTest(unittest.TestCase):
+    """Таймаут чтения не повторяется и сообщается как таймаут."""
+
+    def setUp(self) -> None:
+        self.server = SilentServer()
+        self.addCleanup(self.server.close)
+
+        fast_config = dataclasses.replace(
+            api_clients.config, REQUEST_TIMEOUT=0.3
+        )
+        patcher = mock.patch.object(api_clients, "config", fast_config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        session = build_session()
+        self.addCleanup(session.close)
+        self.client = RawClient(session=session)
+
+    def test_read_timeout_is_attempted_once(self) -> None:
+        url = f"http://127.0.0.1:{self.server.port}/rates"
+
+        with self.assertRaises(ApiRequestError) as error_info:
+            self.client.get(url)
+
+        self.assertIn("Таймаут при обращении к API", str(error_info.exception))
+        self.assertEqual(len(self.server.connections), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
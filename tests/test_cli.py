@@ -0,0 +1,34 @@
+"""Тесты разбора аргументов CLI."""
+
+import contextlib
+import io
+import unittest
+
+from valutatrade_hub.cli.interface import _build_parser
+
+
+class ShowRatesArgumentsTest(unittest.TestCase):
+    """Код валюты show-rates проверяется при разборе аргументов."""
+
+    def setUp(self) -> None:
+        self.parser = _build_parser()
+
+    def test_currency_is_normalized(self) -> None:
+        args = self.parser.parse_args(["show-rates", "--currency", " btc "])
+
+        self.assertEqual(args.currency, "BTC")
+
+    def test_invalid_currency_is_usage_error(self) -> None:
+        stderr = io.StringIO()
+        with (
+            contextlib.redirect_stderr(stderr),
+            self.assertRaises(SystemExit) as exit_info,
+        ):
+            self.parser.parse_args(["show-rates", "--currency", "bitcoin"])
+
+        self.assertEqual(exit_info.exception.code, 2)
+        self.assertIn("Некорректный код валюты 'bitcoin'", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Тесты TTL-кеша RatesUpdater."""
+
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+from valutatrade_hub.core import utils
+from valutatrade_hub.core.usecases import RateManager
+from valutatrade_hub.parser_service.api_clients import BaseApiClient
+from valutatrade_hub.parser_service.storage import RatesStorage
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class FakeClient(BaseApiClient):
+    """Клиент с фиксированными курсами (None — ошибка) и счётчиком."""
+
+    def __init__(self, rates: dict[str, float] | None) -> None:
+        super().__init__()
+        self.rates = rates
+        self.calls = 0
+
+    def fetch_rates(self) -> dict[str, float]:
+        self.calls += 1
+        if self.rates is None:
+            raise ConnectionError("API недоступен")
+        return dict(self.rates)
+
+
+class RatesUpdaterTtlTest(unittest.TestCase):
+    """Свежесть кеша определяется только метками Parser Service."""
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.data_dir = Path(temp_dir.name)
+        self.rates_file = self.data_dir / "rates.json"
+
+        # Core Service работает с тем же rates.json
+        for patcher in (
+            mock.patch.object(utils, "DATA_DIR", self.data_dir),
+            mock.patch.dict(utils._FILE_CACHE, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.crypto = FakeClient({"BTC_USD": 50000.0})
+        self.fiat = FakeClient({"EUR_USD": 1.1})
+        self.updater = RatesUpdater(
+            storage=RatesStorage(
+                rates_file=self.rates_file,
+                history_file=self.data_dir / "exchange_rates.jsonl",
+            ),
+            crypto_client=self.crypto,
+            fiat_client=self.fiat,
+            ttl_seconds=60,
+        )
+        self.addCleanup(self.updater.close)
+
+    def _core_save_rates(self) -> None:
+        """Записать fallback-курс через Core Service."""
+        manager = RateManager()
+        manager.update_rate("BTC", "EUR", 45000.0, "Fallback")
+        manager.flush()
+
+    def _age_parser_data(self, hours: int) -> None:
+        """Состарить метку последнего обновления Parser Service."""
+        data = json.loads(self.rates_file.read_bytes())
+        old = datetime.utcnow() - timedelta(hours=hours)
+        data["updated_at"] = old.isoformat() + "Z"
+        self.rates_file.write_text(json.dumps(data), encoding="utf-8")
+
+    def test_second_update_within_ttl_is_cached(self) -> None:
+        self.updater.run_update()
+        result = self.updater.run_update()
+
+        self.assertTrue(result["cached"])
+        self.assertEqual(self.crypto.calls, 1)
+        self.assertEqual(result["total_rates"], 2)
+
+    def test_core_save_does_not_refresh_stale_parser_data(self) -> None:
+        self.updater.run_update()
+        self._age_parser_data(hours=2)
+        self._core_save_rates()
+
+        result = self.updater.run_update()
+
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.crypto.calls, 2)
+        self.assertEqual(self.fiat.calls, 2)
+
+    def test_core_save_keeps_fresh_parser_data_cached(self) -> None:
+        self.updater.run_update()
+        self._core_save_rates()
+
+        result = self.updater.run_update()
+
+        self.assertTrue(result["cached"])
+        self.assertEqual(self.crypto.calls, 1)
+
+    def test_cache_without_parser_timestamp_is_stale(self) -> None:
+        # Кеш, записанный только Core Service: свежий last_refresh,
+        # но без метки Parser Service
+        self._core_save_rates()
+
+        result = self.updater.run_update()
+
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.crypto.calls, 1)
+
+    def test_single_source_update_does_not_satisfy_ttl(self) -> None:
+        self.updater.run_update(source="coingecko")
+
+        result = self.updater.run_update()
+
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.fiat.calls, 1)
+        self.assertEqual(result["total_rates"], 2)
+
+    def test_update_with_errors_does_not_satisfy_ttl(self) -> None:
+        self.fiat.rates = None
+        self.updater.run_update()
+        # Источник снова доступен, пауза предохранителя истекла
+        self.fiat.rates = {"EUR_USD": 1.1}
+        self.updater._skip_until.clear()
+
+        result = self.updater.run_update()
+
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.fiat.calls, 2)
+        self.assertEqual(result["total_rates"], 2)
+
+    def test_force_bypasses_fresh_cache(self) -> None:
+        self.updater.run_update()
+        result = self.updater.run_update(force=True)
+
+        self.assertFalse(result["cached"])
+        self.assertEqual(self.crypto.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
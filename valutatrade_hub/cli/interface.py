@@ -2,7 +2,14 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import heapq
+import math
+import re
 import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
 
 from valutatrade_hub.core.currencies import list_currencies
 from valutatrade_hub.core.exceptions import (
@@ -12,7 +19,7 @@ from valutatrade_hub.core.exceptions import (
     RateUnavailableError,
     WalletNotFoundError,
 )
-from valutatrade_hub.core.models import User
+from valutatrade_hub.core.models import Portfolio, User
 from valutatrade_hub.core.usecases import (
     PortfolioManager,
     RateManager,
@@ -23,8 +30,10 @@ from valutatrade_hub.core.utils import (
     load_session,
     save_session,
 )
-from valutatrade_hub.parser_service.storage import RatesStorage
-from valutatrade_hub.parser_service.updater import RatesUpdater
+from valutatrade_hub.infra.settings import settings
+
+# Формат кода валюты (те же ограничения, что и в Currency._validate_code)
+_CODE_RE = re.compile(r"[A-Z0-9]{2,5}")
 
 
 def _validate_currency(currency: str) -> str:
@@ -35,33 +44,154 @@ def _validate_currency(currency: str) -> str:
         currency: Код валюты
 
     Returns:
-        Код валюты в верхнем регистре
+        Код валюты в верхнем регистре (интернированная строка)
 
     Raises:
         ValueError: Если валюта некорректна
     """
     if not currency or not currency.strip():
         raise ValueError("Код валюты не может быть пустым")
-    return currency.strip().upper()
+    code = currency.strip().upper()
+    if not _CODE_RE.fullmatch(code):
+        raise ValueError(
+            f"Некорректный код валюты '{currency}': "
+            f"ожидается от 2 до 5 букв или цифр"
+        )
+    # Интернируем код: он используется как ключ словарей кошельков и курсов
+    return sys.intern(code)
+
+
+def _currency_arg(value: str) -> str:
+    """
+    Конвертер argparse для кода валюты.
+
+    Args:
+        value: Строка из командной строки
+
+    Returns:
+        Нормализованный код валюты
+
+    Raises:
+        argparse.ArgumentTypeError: Если код некорректен
+    """
+    try:
+        return _validate_currency(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def _positive_amount(value: str) -> float:
+    """
+    Конвертер argparse для положительной суммы.
+
+    Args:
+        value: Строка из командной строки
+
+    Returns:
+        Сумма в виде float
+
+    Raises:
+        argparse.ArgumentTypeError: Если сумма не является
+            конечным положительным числом
+    """
+    try:
+        amount = float(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"'amount' должен быть числом, получено: '{value}'"
+        ) from e
+    if not math.isfinite(amount) or amount <= 0:
+        raise argparse.ArgumentTypeError(
+            "'amount' должен быть положительным числом"
+        )
+    return amount
+
+
+@dataclass(frozen=True)
+class SessionUser:
+    """Облегчённый пользователь, восстановленный из файла сессии.
+
+    Содержит только то, что нужно CLI (ID и имя), и позволяет
+    не загружать хранилище пользователей, пока сессия не истекла.
+    """
+
+    user_id: int
+    username: str
 
 
 class CLIInterface:
     """Командный интерфейс для взаимодействия с пользователем."""
 
     def __init__(self) -> None:
-        """Инициализация интерфейса."""
-        self.user_manager = UserManager()
-        self.portfolio_manager = PortfolioManager(self.user_manager)
-        self.rate_manager = RateManager()
-        self.current_user: User | None = self._load_session()
+        """Инициализация интерфейса.
 
-    def _load_session(self) -> User | None:
+        Менеджеры и сессия создаются лениво, при первом обращении:
+        команды, которым они не нужны (show-rates, update-rates),
+        не читают файлы пользователей, портфелей и сессии.
         """
-        Загрузить текущую сессию.
+        # Кеш поиска пользователей, включая отрицательные результаты
+        self._user_cache: dict[int, User | None] = {}
+
+    @functools.cached_property
+    def user_manager(self) -> UserManager:
+        """Менеджер пользователей (создаётся при первом обращении)."""
+        return UserManager()
+
+    @functools.cached_property
+    def portfolio_manager(self) -> PortfolioManager:
+        """Менеджер портфелей (создаётся при первом обращении)."""
+        return PortfolioManager(self.user_manager)
+
+    @functools.cached_property
+    def rate_manager(self) -> RateManager:
+        """Менеджер курсов (создаётся при первом обращении)."""
+        return RateManager()
+
+    @functools.cached_property
+    def current_user(self) -> User | SessionUser | None:
+        """Текущий пользователь (сессия загружается при первом обращении)."""
+        return self._load_session()
+
+    @functools.cached_property
+    def portfolio(self) -> Portfolio:
+        """Портфель текущего пользователя (загружается один раз за команду).
+
+        Менеджер возвращает тот же объект, который изменяют покупка и
+        продажа, поэтому после операций повторная загрузка не нужна.
+        Требует залогиненного пользователя.
+        """
+        return self.portfolio_manager.get_portfolio(
+            self.current_user.user_id
+        )
+
+    def _get_user_cached(self, user_id: int) -> User | None:
+        """
+        Получить пользователя по ID с кешированием результата.
+
+        Отсутствующий пользователь тоже кешируется, чтобы повторные
+        запросы не обращались к хранилищу.
+
+        Args:
+            user_id: ID пользователя
 
         Returns:
             Объект User или None
         """
+        if user_id not in self._user_cache:
+            self._user_cache[user_id] = self.user_manager.get_user(user_id)
+        return self._user_cache[user_id]
+
+    def _load_session(self) -> User | SessionUser | None:
+        """
+        Загрузить текущую сессию.
+
+        Пока сессия не истекла, пользователь восстанавливается прямо
+        из файла сессии; после истечения — из хранилища пользователей,
+        и срок сессии продлевается.
+
+        Returns:
+            Объект SessionUser/User или None
+        """
         session = load_session()
         if session is None:
             return None
@@ -70,18 +200,48 @@ class CLIInterface:
         if user_id is None:
             return None
 
-        return self.user_manager.get_user(user_id)
+        username = session.get("username")
+        expires_at = session.get("expires_at")
+        if (
+            username
+            and isinstance(expires_at, int | float)
+            and expires_at > time.time()
+        ):
+            return SessionUser(user_id=user_id, username=username)
+
+        user = self._get_user_cached(user_id)
+        if user is not None:
+            save_session(self._session_data(user))
+        return user
+
+    @staticmethod
+    def _session_data(user: User | SessionUser) -> dict:
+        """
+        Сформировать данные сессии для сохранения.
+
+        Args:
+            user: Текущий пользователь
+
+        Returns:
+            Словарь с user_id, username и сроком действия expires_at
+        """
+        return {
+            "user_id": user.user_id,
+            "username": user.username,
+            "expires_at": time.time() + settings.session_ttl_seconds,
+        }
 
     def _save_session(self) -> None:
         """Сохранить текущую сессию."""
         if self.current_user is None:
             clear_session()
         else:
-            save_session({"user_id": self.current_user.user_id})
+            save_session(self._session_data(self.current_user))
 
     def _clear_session(self) -> None:
         """Очистить текущую сессию."""
         self.current_user = None
+        self.__dict__.pop("portfolio", None)
         clear_session()
 
     def _validate_amount(self, amount: float) -> float:
@@ -173,6 +333,9 @@ class CLIInterface:
             sys.exit(1)
 
         self.current_user = user
+        self._user_cache[user.user_id] = user
+        # Портфель предыдущего пользователя больше не актуален
+        self.__dict__.pop("portfolio", None)
         self._save_session()
         print(f"Вы вошли как '{user.username}'")
 
@@ -186,9 +349,7 @@ class CLIInterface:
         self._require_login()
 
         base = _validate_currency(base)
-        portfolio = self.portfolio_manager.get_portfolio(
-            self.current_user.user_id
-        )
+        portfolio = self.portfolio
         wallets = portfolio.wallets
 
         if not wallets:
@@ -198,34 +359,43 @@ class CLIInterface:
         print(f"\nПортфель пользователя '{self.current_user.username}' "
               f"(база: {base}):")
 
-        total_value = 0.0
+        # Каждая пара (валюта, база) разрешается один раз
+        rates = self.rate_manager.get_or_fetch_rates(
+            (code for code in wallets if code != base), base
+        )
+        rates[base] = 1.0
 
+        # Сначала считаем стоимость всех кошельков одним проходом,
+        # затем суммируем (None — курс недоступен)
+        rows: list[tuple[str, float, float | None]] = []
         for currency_code, wallet in sorted(wallets.items()):
-            balance = wallet.balance
-
-            if currency_code == base:
-                value_in_base = balance
-            else:
-                rate = self.rate_manager.get_or_fetch_rate(
-                    currency_code, base
+            rate = rates.get(currency_code)
+            rows.append((
+                currency_code,
+                wallet.balance,
+                wallet.balance * rate if rate is not None else None,
+            ))
+        total_value = sum(value for *_, value in rows if value is not None)
+
+        # Строки собираем в список и выводим одним вызовом
+        lines: list[str] = []
+        for currency_code, balance, value_in_base in rows:
+            if value_in_base is None:
+                print(
+                    f"  - {currency_code}: {balance:.2f} "
+                    f"→ курс недоступен",
+                    file=sys.stderr,
                 )
-                if rate is None:
-                    print(
-                        f"  - {currency_code}: {balance:.2f} "
-                        f"→ курс недоступен",
-                        file=sys.stderr,
-                    )
-                    continue
-                value_in_base = balance * rate
-
-            total_value += value_in_base
-            print(
+                continue
+
+            lines.append(
                 f"  - {currency_code}: {balance:.4f} "
                 f"→ {value_in_base:.2f} {base}"
             )
 
-        print("  ---------------------------------")
-        print(f"  ИТОГО: {total_value:,.2f} {base}")
+        lines.append("  ---------------------------------")
+        lines.append(f"  ИТОГО: {total_value:,.2f} {base}")
+        print("\n".join(lines))
 
     def buy(self, currency: str, amount: float) -> None:
         """
@@ -240,28 +410,22 @@ class CLIInterface:
         currency = _validate_currency(currency)
         amount = self._validate_amount(amount)
 
-        portfolio = self.portfolio_manager.get_portfolio(
-            self.current_user.user_id
-        )
+        portfolio = self.portfolio
 
         # Получаем старый баланс
         wallet = portfolio.get_wallet(currency)
         old_balance = wallet.balance if wallet else 0.0
 
         try:
-            rate, cost_usd = self.portfolio_manager.buy_currency(
+            rate, cost_usd, wallet = self.portfolio_manager.buy_currency(
                 self.current_user.user_id,
                 currency,
                 amount,
                 self.rate_manager,
             )
-
-            # Получаем новый баланс
-            portfolio = self.portfolio_manager.get_portfolio(
-                self.current_user.user_id
-            )
-            wallet = portfolio.get_wallet(currency)
-            new_balance = wallet.balance if wallet else 0.0
+            new_balance = wallet.balance
+            # Сделка записывается на диск до сообщения об успехе
+            self.portfolio_manager.flush()
 
             print(
                 f"Покупка выполнена: {amount:.4f} {currency} "
@@ -304,9 +468,7 @@ class CLIInterface:
         currency = _validate_currency(currency)
         amount = self._validate_amount(amount)
 
-        portfolio = self.portfolio_manager.get_portfolio(
-            self.current_user.user_id
-        )
+        portfolio = self.portfolio
 
         # Получаем старый баланс
         wallet = portfolio.get_wallet(currency)
@@ -322,19 +484,17 @@ class CLIInterface:
         old_balance = wallet.balance
 
         try:
-            rate, revenue_usd = self.portfolio_manager.sell_currency(
-                self.current_user.user_id,
-                currency,
-                amount,
-                self.rate_manager,
-            )
-
-            # Получаем новый баланс
-            portfolio = self.portfolio_manager.get_portfolio(
-                self.current_user.user_id
+            rate, revenue_usd, wallet = (
+                self.portfolio_manager.sell_currency(
+                    self.current_user.user_id,
+                    currency,
+                    amount,
+                    self.rate_manager,
+                )
             )
-            wallet = portfolio.get_wallet(currency)
-            new_balance = wallet.balance if wallet else 0.0
+            new_balance = wallet.balance
+            # Сделка записывается на диск до сообщения об успехе
+            self.portfolio_manager.flush()
 
             print(
                 f"Продажа выполнена: {amount:.4f} {currency} "
@@ -389,7 +549,9 @@ class CLIInterface:
             currencies = list_currencies()
             if currencies:
                 print("\nДоступные валюты:", file=sys.stderr)
-                for curr in sorted(currencies, key=lambda x: x.code)[:10]:
+                for curr in heapq.nsmallest(
+                    10, currencies, key=lambda x: x.code
+                ):
                     print(f"  - {curr.code}", file=sys.stderr)
             sys.exit(1)
 
@@ -413,20 +575,13 @@ class CLIInterface:
             sys.exit(1)
 
         # Получаем метку времени
-        rate_key = f"{from_currency}_{to_currency}"
-        if rate_key not in self.rate_manager._rates:
-            reverse_key = f"{to_currency}_{from_currency}"
-            if reverse_key in self.rate_manager._rates:
-                rate_key = reverse_key
+        entry = self.rate_manager.get_rate_entry(from_currency, to_currency)
 
         updated_at = "неизвестно"
-        if rate_key in self.rate_manager._rates:
-            updated_at_str = self.rate_manager._rates[rate_key].get(
-                "updated_at"
-            )
+        if entry is not None:
+            updated_at_str = entry.get("updated_at")
             if updated_at_str:
                 try:
-                    from datetime import datetime
                     dt = datetime.fromisoformat(updated_at_str)
                     updated_at = dt.strftime("%Y-%m-%d %H:%M:%S")
                 except (ValueError, TypeError):
@@ -443,19 +598,32 @@ class CLIInterface:
             print(f"Обратный курс {to_currency}→{from_currency}: "
                   f"{reverse_rate:.2f}")
 
-    def update_rates(self, source: str | None = None) -> None:
+    def update_rates(
+        self, source: str | None = None, force: bool = False
+    ) -> None:
         """
         Обновить курсы валют из внешних API.
 
         Args:
             source: Источник для обновления
                 ('coingecko', 'exchangerate' или None для всех)
+            force: Обновить, даже если кеш курсов ещё свежий
         """
+        # Parser Service (requests и API-клиенты) нужен только здесь
+        from valutatrade_hub.parser_service.updater import RatesUpdater
+
         try:
-            updater = RatesUpdater()
-            result = updater.run_update(source)
+            with RatesUpdater() as updater:
+                result = updater.run_update(source, force=force)
 
-            if result["errors"]:
+            if result.get("cached"):
+                print(
+                    f"Rates are up to date. "
+                    f"Total rates: {result['total_rates']}. "
+                    f"Last refresh: {result['last_refresh']} "
+                    f"(use --force to refresh now)"
+                )
+            elif result["errors"]:
                 print(
                     "Update completed with errors. "
                     "Check logs/actions.log for details.",
@@ -497,11 +665,12 @@ class CLIInterface:
             top: Показать N самых дорогих криптовалют
             base: Базовая валюта для отображения
         """
+        from valutatrade_hub.parser_service.storage import RatesStorage
+
         storage = RatesStorage()
         cache_data = storage.load_rates_cache()
 
         pairs = cache_data.get("pairs", {})
-        last_refresh = cache_data.get("last_refresh")
 
         if not pairs:
             print(
@@ -511,75 +680,73 @@ class CLIInterface:
             )
             sys.exit(1)
 
-        # Фильтрация по валюте
+        # Кандидаты: пары валюты из индекса либо все пары кеша
         if currency:
             currency = _validate_currency(currency)
-            filtered_pairs = {
-                pair: data
-                for pair, data in pairs.items()
-                if pair.startswith(f"{currency}_")
-                or pair.endswith(f"_{currency}")
-            }
-
-            if not filtered_pairs:
-                print(
-                    f"Курс для '{currency}' не найден в кеше.",
-                    file=sys.stderr,
-                )
-                sys.exit(1)
+            candidates = cache_data.get("by_currency", {}).get(currency, [])
+        else:
+            candidates = pairs
 
-            pairs = filtered_pairs
+        use_top = top is not None and top > 0
+        crypto_index = (
+            frozenset(cache_data.get("crypto_pairs", ()))
+            if use_top
+            else frozenset()
+        )
 
-        # Фильтрация по топу (только для криптовалют)
-        if top is not None and top > 0:
-            # Выбираем только криптовалюты (BTC, ETH и т.д.)
-            crypto_prefixes = (
-                "BTC_", "ETH_", "SOL_", "LTC_", "XRP_", "ADA_", "DOT_"
+        # Один проход: отбираем пары и попутно — криптовалютные для топа
+        selected: list[tuple[str, dict]] = []
+        crypto_selected: list[tuple[str, dict]] = []
+        for pair in candidates:
+            data = pairs.get(pair)
+            if data is None:
+                continue
+            selected.append((pair, data))
+            if pair in crypto_index:
+                crypto_selected.append((pair, data))
+
+        if currency and not selected:
+            print(
+                f"Курс для '{currency}' не найден в кеше.",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+        # Топ N самых дорогих (только для криптовалют)
+        if use_top and crypto_selected:
+            selected = heapq.nlargest(
+                top, crypto_selected, key=lambda x: x[1].get("rate", 0)
             )
-            crypto_pairs = {
-                pair: data
-                for pair, data in pairs.items()
-                if pair.startswith(crypto_prefixes)
-            }
-
-            if crypto_pairs:
-                # Сортируем по курсу (по убыванию)
-                sorted_pairs = sorted(
-                    crypto_pairs.items(),
-                    key=lambda x: x[1].get("rate", 0),
-                    reverse=True,
-                )[:top]
-                pairs = dict(sorted_pairs)
-
-        # Форматирование вывода
-        if last_refresh:
-            try:
-                from datetime import datetime
-                dt = datetime.fromisoformat(
-                    last_refresh.replace("Z", "+00:00")
-                )
-                refresh_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except (ValueError, TypeError):
-                refresh_str = last_refresh
-        else:
-            refresh_str = "неизвестно"
 
-        print(f"Rates from cache (updated at {refresh_str}):")
+        # Форматирование вывода (метка времени разобрана при загрузке)
+        refresh_str = cache_data.get("_last_refresh_fmt") or "неизвестно"
+
+        lines = [f"Rates from cache (updated at {refresh_str}):"]
 
         # Сортируем пары для вывода
-        sorted_pairs = sorted(
-            pairs.items(), key=lambda x: x[0]
-        )
+        selected.sort(key=lambda x: x[0])
 
-        for pair, data in sorted_pairs:
+        for pair, data in selected:
             rate = data.get("rate", 0)
             source = data.get("source", "Unknown")
             source_str = f" (source: {source})" if source != "Unknown" else ""
-            print(f"  - {pair}: {rate:.2f}{source_str}")
+            lines.append(f"  - {pair}: {rate:.2f}{source_str}")
 
+        # Выводим все строки одним вызовом
+        print("\n".join(lines))
 
-def main() -> None:
-    """Точка входа в CLI."""
+
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """
+    Построить парсер аргументов командной строки.
+
+    Парсер строится один раз и переиспользуется при повторных
+    вызовах main() (например, из тестов или обёрток).
+
+    Returns:
+        Настроенный ArgumentParser со всеми подкомандами
+    """
     parser = argparse.ArgumentParser(
         description="ValutaTrade Hub - управление валютным кошельком"
     )
@@ -595,6 +762,9 @@ def main() -> None:
     register_parser.add_argument(
         "--password", required=True, help="Пароль (минимум 4 символа)"
     )
+    register_parser.set_defaults(
+        handler=lambda cli, a: cli.register(a.username, a.password)
+    )
 
     # Команда login
     login_parser = subparsers.add_parser("login", help="Войти в систему")
@@ -604,6 +774,9 @@ def main() -> None:
     login_parser.add_argument(
         "--password", required=True, help="Пароль"
     )
+    login_parser.set_defaults(
+        handler=lambda cli, a: cli.login(a.username, a.password)
+    )
 
     # Команда show-portfolio
     portfolio_parser = subparsers.add_parser(
@@ -611,33 +784,49 @@ def main() -> None:
     )
     portfolio_parser.add_argument(
         "--base",
+        type=_currency_arg,
         default="USD",
         help="Базовая валюта (по умолчанию USD)",
     )
+    portfolio_parser.set_defaults(
+        handler=lambda cli, a: cli.show_portfolio(a.base)
+    )
 
     # Команда buy
     buy_parser = subparsers.add_parser("buy", help="Купить валюту")
     buy_parser.add_argument(
-        "--currency", required=True, help="Код покупаемой валюты"
+        "--currency",
+        type=_currency_arg,
+        required=True,
+        help="Код покупаемой валюты",
     )
     buy_parser.add_argument(
         "--amount",
-        type=float,
+        type=_positive_amount,
         required=True,
         help="Количество покупаемой валюты",
     )
+    buy_parser.set_defaults(
+        handler=lambda cli, a: cli.buy(a.currency, a.amount)
+    )
 
     # Команда sell
     sell_parser = subparsers.add_parser("sell", help="Продать валюту")
     sell_parser.add_argument(
-        "--currency", required=True, help="Код продаваемой валюты"
+        "--currency",
+        type=_currency_arg,
+        required=True,
+        help="Код продаваемой валюты",
     )
     sell_parser.add_argument(
         "--amount",
-        type=float,
+        type=_positive_amount,
         required=True,
         help="Количество продаваемой валюты",
     )
+    sell_parser.set_defaults(
+        handler=lambda cli, a: cli.sell(a.currency, a.amount)
+    )
 
     # Команда get-rate
     rate_parser = subparsers.add_parser("get-rate", help="Получить курс")
@@ -647,6 +836,9 @@ def main() -> None:
     rate_parser.add_argument(
         "--to", dest="to_currency", required=True, help="Целевая валюта"
     )
+    rate_parser.set_defaults(
+        handler=lambda cli, a: cli.get_rate(a.from_currency, a.to_currency)
+    )
 
     # Команда update-rates
     update_rates_parser = subparsers.add_parser(
@@ -657,13 +849,23 @@ def main() -> None:
         choices=["coingecko", "exchangerate"],
         help="Обновить данные только из указанного источника",
     )
+    update_rates_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Обновить курсы, даже если кеш ещё свежий",
+    )
+    update_rates_parser.set_defaults(
+        handler=lambda cli, a: cli.update_rates(a.source, a.force)
+    )
 
     # Команда show-rates
     show_rates_parser = subparsers.add_parser(
         "show-rates", help="Показать курсы валют из локального кеша"
     )
     show_rates_parser.add_argument(
-        "--currency", help="Показать курс только для указанной валюты"
+        "--currency",
+        type=_currency_arg,
+        help="Показать курс только для указанной валюты",
     )
     show_rates_parser.add_argument(
         "--top",
@@ -674,7 +876,18 @@ def main() -> None:
         "--base",
         help="Базовая валюта для отображения (пока не используется)",
     )
+    show_rates_parser.set_defaults(
+        handler=lambda cli, a: cli.show_rates(
+            currency=a.currency, top=a.top, base=a.base
+        )
+    )
+
+    return parser
 
+
+def main() -> None:
+    """Точка входа в CLI."""
+    parser = _build_parser()
     args = parser.parse_args()
 
     if not args.command:
@@ -682,27 +895,7 @@ def main() -> None:
         sys.exit(1)
 
     interface = CLIInterface()
-
-    if args.command == "register":
-        interface.register(args.username, args.password)
-    elif args.command == "login":
-        interface.login(args.username, args.password)
-    elif args.command == "show-portfolio":
-        interface.show_portfolio(args.base)
-    elif args.command == "buy":
-        interface.buy(args.currency, args.amount)
-    elif args.command == "sell":
-        interface.sell(args.currency, args.amount)
-    elif args.command == "get-rate":
-        interface.get_rate(args.from_currency, args.to_currency)
-    elif args.command == "update-rates":
-        interface.update_rates(args.source)
-    elif args.command == "show-rates":
-        interface.show_rates(
-            currency=args.currency,
-            top=args.top,
-            base=args.base,
-        )
+    args.handler(interface, args)
 
 
 if __name__ == "__main__":
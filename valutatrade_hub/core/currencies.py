@@ -1,16 +1,27 @@
 """Модели валют с иерархией наследования."""
 
+import re
+import sys
 from abc import ABC, abstractmethod
+from functools import lru_cache
 
 from valutatrade_hub.core.exceptions import (
     CurrencyNotFoundError,
     InvalidCurrencyCodeError,
 )
 
+# Допустимый формат нормализованного кода валюты
+_CODE_RE = re.compile(r"[A-Z0-9]{2,5}")
+
+# Допустимые символы кода (для диагностики ошибок формата)
+_CODE_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+
 
 class Currency(ABC):
     """Абстрактный базовый класс валюты."""
 
+    __slots__ = ("name", "code", "_hash", "_display")
+
     def __init__(self, name: str, code: str) -> None:
         """
         Инициализация валюты.
@@ -28,7 +39,10 @@ class Currency(ABC):
         self._validate_code(code)
 
         self.name = name.strip()
-        self.code = code.strip().upper()
+        # Интернированный код ускоряет поиск в реестре и сравнения,
+        # хеш вычисляется один раз
+        self.code = sys.intern(code.strip().upper())
+        self._hash = hash(self.code)
 
     @staticmethod
     def _validate_code(code: str) -> None:
@@ -41,6 +55,11 @@ class Currency(ABC):
         Raises:
             InvalidCurrencyCodeError: Если код некорректен
         """
+        # Быстрый путь: корректный код проверяется одним регулярным
+        # выражением, подробная диагностика — только для ошибок
+        if code and _CODE_RE.fullmatch(code.strip().upper()):
+            return
+
         if not code or not code.strip():
             raise InvalidCurrencyCodeError(
                 code or "", "код валюты не может быть пустым"
@@ -53,16 +72,25 @@ class Currency(ABC):
                 code, "код должен содержать от 2 до 5 символов"
             )
 
-        if " " in code_clean:
+        # Один проход по строке: собираем недопустимые символы
+        # и классифицируем только их
+        bad_chars = set(code_clean).difference(_CODE_CHARS)
+
+        if " " in bad_chars:
             raise InvalidCurrencyCodeError(
                 code, "код не должен содержать пробелы"
             )
 
-        if not code_clean.isalnum():
+        if not all(char.isalnum() for char in bad_chars):
             raise InvalidCurrencyCodeError(
                 code, "код должен содержать только буквы и цифры"
             )
 
+        # Буквы и цифры вне латиницы/ASCII
+        raise InvalidCurrencyCodeError(
+            code, "код должен содержать только латинские буквы и цифры"
+        )
+
     @abstractmethod
     def get_display_info(self) -> str:
         """
@@ -92,12 +120,14 @@ class Currency(ABC):
 
     def __hash__(self) -> int:
         """Хеш валюты для использования в словарях и множествах."""
-        return hash(self.code)
+        return self._hash
 
 
 class FiatCurrency(Currency):
     """Фиатная валюта (традиционная валюта)."""
 
+    __slots__ = ("issuing_country",)
+
     def __init__(
         self, name: str, code: str, issuing_country: str
     ) -> None:
@@ -117,6 +147,12 @@ class FiatCurrency(Currency):
             )
 
         self.issuing_country = issuing_country.strip()
+        # Атрибуты не меняются после создания — строку для UI/логов
+        # форматируем один раз
+        self._display = (
+            f"[FIAT] {self.code} — {self.name} "
+            f"(Issuing: {self.issuing_country})"
+        )
 
     def get_display_info(self) -> str:
         """
@@ -125,15 +161,14 @@ class FiatCurrency(Currency):
         Returns:
             Форматированная строка: "[FIAT] CODE — Name (Issuing: Country)"
         """
-        return (
-            f"[FIAT] {self.code} — {self.name} "
-            f"(Issuing: {self.issuing_country})"
-        )
+        return self._display
 
 
 class CryptoCurrency(Currency):
     """Криптовалюта."""
 
+    __slots__ = ("algorithm", "market_cap")
+
     def __init__(
         self,
         name: str,
@@ -162,6 +197,13 @@ class CryptoCurrency(Currency):
 
         self.algorithm = algorithm.strip()
         self.market_cap = float(market_cap)
+        # Атрибуты не меняются после создания — строку для UI/логов
+        # форматируем один раз
+        mcap_str = f"{self.market_cap:.2e}" if self.market_cap > 0 else "N/A"
+        self._display = (
+            f"[CRYPTO] {self.code} — {self.name} "
+            f"(Algo: {self.algorithm}, MCAP: {mcap_str})"
+        )
 
     def get_display_info(self) -> str:
         """
@@ -171,21 +213,44 @@ class CryptoCurrency(Currency):
             Форматированная строка: "[CRYPTO] CODE — Name "
             "(Algo: Algorithm, MCAP: MarketCap)"
         """
-        mcap_str = f"{self.market_cap:.2e}" if self.market_cap > 0 else "N/A"
-        return (
-            f"[CRYPTO] {self.code} — {self.name} "
-            f"(Algo: {self.algorithm}, MCAP: {mcap_str})"
-        )
+        return self._display
 
 
 # Реестр валют
 _CURRENCY_REGISTRY: dict[str, Currency] = {}
 
+# Снимок всех валют реестра для list_currencies
+# (None — устарел после регистрации, пересобирается при чтении)
+_ALL_CURRENCIES: tuple[Currency, ...] | None = None
+
+# Реестр, заранее разбитый по типам валют для list_currencies
+_CURRENCIES_BY_TYPE: dict[type, dict[str, Currency]] = {
+    FiatCurrency: {},
+    CryptoCurrency: {},
+}
+
+
+def _add_to_registry(currency: Currency) -> None:
+    """
+    Добавить (или заменить) валюту в реестре и индексе по типам.
+
+    Args:
+        currency: Объект валюты
+    """
+    global _ALL_CURRENCIES
+
+    _CURRENCY_REGISTRY[currency.code] = currency
+    _ALL_CURRENCIES = None
+    for currency_type, index in _CURRENCIES_BY_TYPE.items():
+        if isinstance(currency, currency_type):
+            index[currency.code] = currency
+        else:
+            # Замена валюты на валюту другого типа
+            index.pop(currency.code, None)
+
 
 def _initialize_registry() -> None:
     """Инициализировать реестр валют предопределёнными значениями."""
-    global _CURRENCY_REGISTRY
-
     # Фиатные валюты
     fiat_currencies = [
         FiatCurrency("US Dollar", "USD", "United States"),
@@ -221,7 +286,30 @@ def _initialize_registry() -> None:
     ]
 
     for currency in fiat_currencies + crypto_currencies:
-        _CURRENCY_REGISTRY[currency.code] = currency
+        _add_to_registry(currency)
+
+
+@lru_cache(maxsize=512)
+def _normalize_code(code: str) -> str:
+    """
+    Нормализовать и проверить код валюты (с кешированием).
+
+    Одни и те же коды ("USD", "BTC") запрашиваются многократно,
+    поэтому результат нормализации запоминается.
+
+    Args:
+        code: Код валюты в произвольном регистре, возможно с пробелами
+
+    Returns:
+        Интернированный код в верхнем регистре без пробелов по краям
+
+    Raises:
+        InvalidCurrencyCodeError: Если код некорректен
+    """
+    code_clean = code.strip().upper()
+    if not _CODE_RE.fullmatch(code_clean):
+        Currency._validate_code(code_clean)
+    return sys.intern(code_clean)
 
 
 def get_currency(code: str) -> Currency:
@@ -238,18 +326,12 @@ def get_currency(code: str) -> Currency:
         InvalidCurrencyCodeError: Если код некорректен
         CurrencyNotFoundError: Если валюта не найдена в реестре
     """
-    if not _CURRENCY_REGISTRY:
-        _initialize_registry()
-
-    # Валидация кода
-    code_clean = code.strip().upper()
-    Currency._validate_code(code_clean)
-
-    # Поиск в реестре
-    if code_clean not in _CURRENCY_REGISTRY:
-        raise CurrencyNotFoundError(code_clean)
+    code_clean = _normalize_code(code)
 
-    return _CURRENCY_REGISTRY[code_clean]
+    try:
+        return _CURRENCY_REGISTRY[code_clean]
+    except KeyError:
+        raise CurrencyNotFoundError(code_clean) from None
 
 
 def register_currency(currency: Currency) -> None:
@@ -259,10 +341,7 @@ def register_currency(currency: Currency) -> None:
     Args:
         currency: Объект валюты для регистрации
     """
-    if not _CURRENCY_REGISTRY:
-        _initialize_registry()
-
-    _CURRENCY_REGISTRY[currency.code] = currency
+    _add_to_registry(currency)
 
 
 def list_currencies(currency_type: type | None = None) -> list[Currency]:
@@ -275,15 +354,26 @@ def list_currencies(currency_type: type | None = None) -> list[Currency]:
     Returns:
         Список валют
     """
-    if not _CURRENCY_REGISTRY:
-        _initialize_registry()
-
-    currencies = list(_CURRENCY_REGISTRY.values())
+    global _ALL_CURRENCIES
 
     if currency_type is None:
-        return currencies
+        # Регистрация валют редка, поэтому снимок переиспользуется
+        if _ALL_CURRENCIES is None:
+            _ALL_CURRENCIES = tuple(_CURRENCY_REGISTRY.values())
+        return list(_ALL_CURRENCIES)
+
+    # Фиатные и криптовалюты разбиты по типам при регистрации
+    index = _CURRENCIES_BY_TYPE.get(currency_type)
+    if index is not None:
+        return list(index.values())
 
     return [
-        curr for curr in currencies if isinstance(curr, currency_type)
+        curr
+        for curr in _CURRENCY_REGISTRY.values()
+        if isinstance(curr, currency_type)
     ]
 
+
+# Реестр строится один раз при импорте модуля, поэтому функциям
+# доступа не нужно проверять его инициализацию при каждом вызове
+_initialize_registry()
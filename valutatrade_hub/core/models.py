@@ -1,13 +1,72 @@
 """Основные классы моделей приложения."""
 
 import hashlib
+import hmac
+import operator
 import secrets
+import sys
+from collections.abc import Mapping
 from datetime import datetime
+from types import MappingProxyType
+
+# Фиксированные курсы обмена для Portfolio.get_total_value
+# (для упрощения; в реальном приложении курсы получаются из API).
+# Строка — базовая валюта, столбец — валюта кошелька; порядок
+# строк и столбцов совпадает с порядком ключей _CCY_ID.
+_CCY_ID: dict[str, int] = {"USD": 0, "EUR": 1, "BTC": 2, "ETH": 3, "RUB": 4}
+
+_FIXED_RATES: tuple[tuple[float, ...], ...] = (
+    # USD   EUR       BTC         ETH        RUB
+    (1.0, 0.92, 0.000023, 0.00035, 92.0),  # USD
+    (1.09, 1.0, 0.000025, 0.00038, 100.0),  # EUR
+    (43500.0, 40000.0, 1.0, 15.5, 4002000.0),  # BTC
+    (2800.0, 2576.0, 0.064, 1.0, 257600.0),  # ETH
+    (0.011, 0.01, 0.00000025, 0.0000039, 1.0),  # RUB
+)
+
+
+def _as_float(value: object, error_prefix: str) -> float:
+    """
+    Привести число к float.
+
+    Значения типов float и int (обычный случай) приводятся без
+    обработчика исключений; остальные — через float() с обёрткой
+    ошибки в ValueError.
+
+    Args:
+        value: Приводимое значение
+        error_prefix: Начало сообщения об ошибке
+
+    Returns:
+        Значение типа float
+
+    Raises:
+        ValueError: Если значение нельзя привести к float
+    """
+    value_type = type(value)
+    if value_type is float:
+        return value
+    if value_type is int:
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{error_prefix}: {e}") from e
 
 
 class User:
     """Класс пользователя системы."""
 
+    __slots__ = (
+        "_user_id",
+        "_username",
+        "_hashed_password",
+        "_salt",
+        "_salt_bytes",
+        "_registration_date",
+        "_reg_iso",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -25,12 +84,22 @@ class User:
             hashed_password: Зашифрованный пароль
             salt: Уникальная соль для пароля
             registration_date: Дата регистрации
+
+        Raises:
+            ValueError: Если соль пустая
         """
+        if not salt:
+            raise ValueError("Соль пароля не может быть пустой")
+
         self._user_id = user_id
         self._username = username
         self._hashed_password = hashed_password
         self._salt = salt
+        # Закодированная соль, чтобы не кодировать её при каждой проверке
+        self._salt_bytes = salt.encode()
         self._registration_date = registration_date
+        # Дата регистрации не меняется — ISO-строку формируем один раз
+        self._reg_iso = registration_date.isoformat()
 
     @property
     def user_id(self) -> int:
@@ -74,7 +143,7 @@ class User:
         return {
             "user_id": self._user_id,
             "username": self._username,
-            "registration_date": self._registration_date.isoformat(),
+            "registration_date": self._reg_iso,
         }
 
     def change_password(self, new_password: str) -> None:
@@ -90,14 +159,8 @@ class User:
         if len(new_password) < 4:
             raise ValueError("Пароль должен быть не короче 4 символов")
 
-        # Генерируем новую соль или используем существующую
-        if not self._salt:
-            self._salt = secrets.token_hex(8)
-
-        # Хешируем пароль с солью
-        self._hashed_password = hashlib.sha256(
-            (new_password + self._salt).encode()
-        ).hexdigest()
+        # Хешируем пароль с существующей солью (непустая, см. __init__)
+        self._hashed_password = self._digest(new_password, self._salt_bytes)
 
     def verify_password(self, password: str) -> bool:
         """
@@ -109,10 +172,29 @@ class User:
         Returns:
             True если пароль верный, False иначе
         """
-        hashed_input = hashlib.sha256(
-            (password + self._salt).encode()
-        ).hexdigest()
-        return hashed_input == self._hashed_password
+        hashed_input = self._digest(password, self._salt_bytes)
+        # Сравнение за постоянное время
+        return hmac.compare_digest(hashed_input, self._hashed_password)
+
+    @staticmethod
+    def _digest(password: str, salt: bytes) -> str:
+        """
+        Вычислить хеш пароля с солью.
+
+        Формат (SHA-256 от пароля с дописанной солью) совпадает с уже
+        сохранёнными в users.json хешами. Части подаются в хеш двумя
+        вызовами update(), без промежуточной конкатенации строк.
+
+        Args:
+            password: Пароль
+            salt: Соль в байтах (UTF-8)
+
+        Returns:
+            Хеш в шестнадцатеричном виде
+        """
+        hasher = hashlib.sha256(password.encode())
+        hasher.update(salt)
+        return hasher.hexdigest()
 
     @staticmethod
     def hash_password(
@@ -134,13 +216,14 @@ class User:
         if len(password) < 4:
             raise ValueError("Пароль должен быть не короче 4 символов")
 
-        hashed = hashlib.sha256((password + salt).encode()).hexdigest()
-        return hashed, salt
+        return User._digest(password, salt.encode()), salt
 
 
 class Wallet:
     """Кошелёк пользователя для одной конкретной валюты."""
 
+    __slots__ = ("currency_code", "_balance")
+
     def __init__(self, currency_code: str, balance: float = 0.0) -> None:
         """
         Инициализация кошелька.
@@ -149,9 +232,12 @@ class Wallet:
             currency_code: Код валюты (например, "USD", "BTC")
             balance: Начальный баланс (по умолчанию 0.0)
         """
-        self.currency_code = currency_code
-        # Гарантируем неотрицательность
-        self._balance = max(0.0, float(balance))
+        # Код интернируется: он служит ключом словарей кошельков и курсов
+        self.currency_code = sys.intern(currency_code)
+        # Приводим один раз и гарантируем неотрицательность
+        self._balance = max(
+            0.0, _as_float(balance, "Некорректное значение баланса")
+        )
 
     @property
     def balance(self) -> float:
@@ -161,17 +247,13 @@ class Wallet:
     @balance.setter
     def balance(self, value: float) -> None:
         """Сеттер для balance с проверкой."""
-        try:
-            float_value = float(value)
-            if float_value < 0:
-                raise ValueError(
-                    "Баланс не может быть отрицательным"
-                )
-            self._balance = float_value
-        except (TypeError, ValueError) as e:
+        float_value = _as_float(value, "Некорректное значение баланса")
+        if float_value < 0:
             raise ValueError(
-                f"Некорректное значение баланса: {e}"
-            ) from e
+                "Некорректное значение баланса: "
+                "Баланс не может быть отрицательным"
+            )
+        self._balance = float_value
 
     def deposit(self, amount: float) -> None:
         """
@@ -183,13 +265,25 @@ class Wallet:
         Raises:
             ValueError: Если сумма отрицательная или некорректная
         """
-        try:
-            float_amount = float(amount)
-            if float_amount <= 0:
-                raise ValueError("Сумма пополнения должна быть положительной")
-            self._balance += float_amount
-        except (TypeError, ValueError) as e:
-            raise ValueError(f"Некорректная сумма: {e}") from e
+        float_amount = _as_float(amount, "Некорректная сумма")
+        if float_amount <= 0:
+            raise ValueError(
+                "Некорректная сумма: "
+                "Сумма пополнения должна быть положительной"
+            )
+        self._balance += float_amount
+
+    def _deposit_fast(self, amount: float) -> None:
+        """
+        Пополнить баланс без проверок (доверенный путь).
+
+        Для внутренних вызовов, где сумма уже проверена
+        (положительное число).
+
+        Args:
+            amount: Проверенная положительная сумма
+        """
+        self._balance += amount
 
     def withdraw(self, amount: float) -> None:
         """
@@ -201,19 +295,19 @@ class Wallet:
         Raises:
             ValueError: Если сумма превышает баланс или отрицательная
         """
-        try:
-            float_amount = float(amount)
-            if float_amount <= 0:
-                raise ValueError("Сумма снятия должна быть положительной")
-            if float_amount > self._balance:
-                raise ValueError(
-                    f"Недостаточно средств. "
-                    f"Текущий баланс: {self._balance}, "
-                    f"запрошено: {float_amount}"
-                )
-            self._balance -= float_amount
-        except (TypeError, ValueError) as e:
-            raise ValueError(f"Некорректная сумма: {e}") from e
+        float_amount = _as_float(amount, "Некорректная сумма")
+        if float_amount <= 0:
+            raise ValueError(
+                "Некорректная сумма: "
+                "Сумма снятия должна быть положительной"
+            )
+        if float_amount > self._balance:
+            raise ValueError(
+                f"Некорректная сумма: Недостаточно средств. "
+                f"Текущий баланс: {self._balance}, "
+                f"запрошено: {float_amount}"
+            )
+        self._balance -= float_amount
 
     def get_balance_info(self) -> dict:
         """
@@ -231,6 +325,8 @@ class Wallet:
 class Portfolio:
     """Управление всеми кошельками одного пользователя."""
 
+    __slots__ = ("_user_id", "_wallets", "_wallets_view", "_user")
+
     def __init__(
         self, user_id: int, wallets: dict[str, Wallet] | None = None
     ) -> None:
@@ -245,6 +341,8 @@ class Portfolio:
         self._wallets: dict[str, Wallet] = (
             wallets.copy() if wallets else {}
         )
+        # Представление только для чтения, отражающее изменения
+        self._wallets_view = MappingProxyType(self._wallets)
         self._user: User | None = None
 
     @property
@@ -258,9 +356,13 @@ class Portfolio:
         return self._user
 
     @property
-    def wallets(self) -> dict[str, Wallet]:
-        """Геттер, возвращающий копию словаря кошельков."""
-        return self._wallets.copy()
+    def wallets(self) -> Mapping[str, Wallet]:
+        """Геттер, возвращающий словарь кошельков только для чтения.
+
+        Копия не создаётся; для изменяемой копии используйте
+        dict(portfolio.wallets).
+        """
+        return self._wallets_view
 
     def set_user(self, user: User) -> None:
         """
@@ -288,13 +390,12 @@ class Portfolio:
         Raises:
             ValueError: Если кошелёк с такой валютой уже существует
         """
-        if currency_code in self._wallets:
+        # Проверка и вставка за один поиск в словаре
+        wallet = Wallet(currency_code=currency_code, balance=0.0)
+        if self._wallets.setdefault(currency_code, wallet) is not wallet:
             raise ValueError(
                 f"Кошелёк с валютой {currency_code} уже существует в портфеле"
             )
-
-        wallet = Wallet(currency_code=currency_code, balance=0.0)
-        self._wallets[currency_code] = wallet
         return wallet
 
     def get_wallet(self, currency_code: str) -> Wallet | None:
@@ -309,6 +410,40 @@ class Portfolio:
         """
         return self._wallets.get(currency_code)
 
+    def apply_deltas(self, deltas: Mapping[str, float]) -> None:
+        """
+        Атомарно изменить балансы нескольких кошельков.
+
+        Сначала проверяются все изменения, затем они применяются
+        одним проходом: при ошибке ни один баланс не меняется.
+        Недостающие кошельки создаются.
+
+        Args:
+            deltas: Словарь {код валюты: изменение баланса}
+                (положительное — пополнение, отрицательное — снятие)
+
+        Raises:
+            ValueError: Если изменение некорректно или баланс
+                какого-либо кошелька стал бы отрицательным
+        """
+        new_balances: dict[str, float] = {}
+        for currency_code, delta in deltas.items():
+            wallet = self._wallets.get(currency_code)
+            balance = wallet._balance if wallet is not None else 0.0
+            new_balance = balance + _as_float(delta, "Некорректная сумма")
+            if new_balance < 0:
+                raise ValueError(
+                    f"Недостаточно средств {currency_code}. "
+                    f"Текущий баланс: {balance}, изменение: {delta}"
+                )
+            new_balances[currency_code] = new_balance
+
+        for currency_code, new_balance in new_balances.items():
+            wallet = self._wallets.get(currency_code)
+            if wallet is None:
+                wallet = self.add_currency(currency_code)
+            wallet._balance = new_balance
+
     def get_total_value(self, base_currency: str = "USD") -> float:
         """
         Получить общую стоимость всех валют в указанной базовой валюте.
@@ -325,63 +460,19 @@ class Portfolio:
             Для реальных курсов используйте PortfolioManager
             с RateManager.
         """
-        # Фиксированные курсы обмена (для упрощения)
-        # В реальном приложении эти курсы будут получаться из API
-        exchange_rates: dict[str, dict[str, float]] = {
-            "USD": {
-                "USD": 1.0,
-                "EUR": 0.92,
-                "BTC": 0.000023,
-                "ETH": 0.00035,
-                "RUB": 92.0,
-            },
-            "EUR": {
-                "USD": 1.09,
-                "EUR": 1.0,
-                "BTC": 0.000025,
-                "ETH": 0.00038,
-                "RUB": 100.0,
-            },
-            "BTC": {
-                "USD": 43500.0,
-                "EUR": 40000.0,
-                "BTC": 1.0,
-                "ETH": 15.5,
-                "RUB": 4002000.0,
-            },
-            "ETH": {
-                "USD": 2800.0,
-                "EUR": 2576.0,
-                "BTC": 0.064,
-                "ETH": 1.0,
-                "RUB": 257600.0,
-            },
-            "RUB": {
-                "USD": 0.011,
-                "EUR": 0.01,
-                "BTC": 0.00000025,
-                "ETH": 0.0000039,
-                "RUB": 1.0,
-            },
-        }
-
-        total_value = 0.0
+        base_id = _CCY_ID.get(base_currency)
 
         # Если базовая валюта отсутствует в курсах, возвращаем 0
-        if base_currency not in exchange_rates:
+        if base_id is None:
             return 0.0
 
-        base_rates = exchange_rates[base_currency]
-
-        for currency_code, wallet in self._wallets.items():
-            if currency_code == base_currency:
-                # Если валюта совпадает с базовой, добавляем баланс как есть
-                total_value += wallet.balance
-            elif currency_code in base_rates:
-                # Конвертируем в базовую валюту
-                rate = base_rates[currency_code]
-                total_value += wallet.balance * rate
-            # Если курс не найден, пропускаем эту валюту
-
-        return total_value
+        # Вектор балансов, выровненный по столбцам таблицы: кошельков
+        # может быть сколько угодно, но вклад дают только валюты из
+        # таблицы, поэтому работа ограничена её размером. Курс валюты
+        # к самой себе на диагонали таблицы равен 1.0
+        balances = [
+            wallet._balance if wallet is not None else 0.0
+            for wallet in map(self._wallets.get, _CCY_ID)
+        ]
+        return sum(map(operator.mul, balances, _FIXED_RATES[base_id]))
 
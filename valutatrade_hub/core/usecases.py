@@ -1,6 +1,12 @@
 """Бизнес-логика приложения."""
 
-from datetime import datetime, timedelta
+import atexit
+import sys
+import time
+from collections.abc import Iterable, Mapping
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any
 
 from valutatrade_hub.core.currencies import get_currency
 from valutatrade_hub.core.exceptions import (
@@ -14,11 +20,53 @@ from valutatrade_hub.core.utils import (
     ensure_data_dir,
     load_json,
     save_json,
+    save_json_durable,
     validate_currency_code,
 )
 from valutatrade_hub.decorators import log_action
 from valutatrade_hub.infra.settings import settings
 
+# Фиксированные курсы для заглушки (неизменяемые, строятся один раз)
+_FALLBACK_RATES: Mapping[str, Mapping[str, float]] = MappingProxyType({
+    "USD": MappingProxyType({
+        "USD": 1.0,
+        "EUR": 0.92,
+        "BTC": 0.000023,
+        "ETH": 0.00035,
+        "RUB": 92.0,
+    }),
+    "EUR": MappingProxyType({
+        "USD": 1.09,
+        "EUR": 1.0,
+        "BTC": 0.000025,
+        "ETH": 0.00038,
+        "RUB": 100.0,
+    }),
+    "BTC": MappingProxyType({
+        "USD": 43500.0,
+        "EUR": 40000.0,
+        "BTC": 1.0,
+        "ETH": 15.5,
+        "RUB": 4002000.0,
+    }),
+    "ETH": MappingProxyType({
+        "USD": 2800.0,
+        "EUR": 2576.0,
+        "BTC": 0.064,
+        "ETH": 1.0,
+        "RUB": 257600.0,
+    }),
+    "RUB": MappingProxyType({
+        "USD": 0.011,
+        "EUR": 0.01,
+        "BTC": 0.00000025,
+        "ETH": 0.0000039,
+        "RUB": 1.0,
+    }),
+})
+
+_NO_RATES: Mapping[str, float] = MappingProxyType({})
+
 
 class UserManager:
     """Менеджер для работы с пользователями."""
@@ -27,38 +75,48 @@ class UserManager:
         """Инициализация менеджера пользователей."""
         ensure_data_dir()
         self._users: dict[int, User] = {}
+        # Индекс имя пользователя -> ID для поиска за O(1)
+        self._username_to_id: dict[str, int] = {}
+        self._next_user_id = 1
         self._load_users()
 
     def _load_users(self) -> None:
         """Загрузить пользователей из JSON файла."""
         users_data = load_json("users.json")
+        fromisoformat = datetime.fromisoformat
 
-        for user_data in users_data:
-            user = User(
+        users = [
+            User(
                 user_id=user_data["user_id"],
                 username=user_data["username"],
                 hashed_password=user_data["hashed_password"],
                 salt=user_data["salt"],
-                registration_date=datetime.fromisoformat(
+                registration_date=fromisoformat(
                     user_data["registration_date"]
                 ),
             )
-            self._users[user.user_id] = user
+            for user_data in users_data
+        ]
+        self._users = {user.user_id: user for user in users}
+        # При повторяющихся именах побеждает первая запись
+        self._username_to_id = {
+            user.username: user.user_id for user in reversed(users)
+        }
+
+        self._next_user_id = max(self._users, default=0) + 1
 
     def _save_users(self) -> None:
         """Сохранить пользователей в JSON файл."""
-        users_data = []
-
-        for user in self._users.values():
-            users_data.append(
-                {
-                    "user_id": user.user_id,
-                    "username": user.username,
-                    "hashed_password": user.hashed_password,
-                    "salt": user.salt,
-                    "registration_date": user.registration_date.isoformat(),
-                }
-            )
+        users_data = [
+            {
+                "user_id": user.user_id,
+                "username": user.username,
+                "hashed_password": user.hashed_password,
+                "salt": user.salt,
+                "registration_date": user.registration_date.isoformat(),
+            }
+            for user in self._users.values()
+        ]
 
         save_json("users.json", users_data)
 
@@ -78,14 +136,13 @@ class UserManager:
             ValueError: Если пользователь с таким именем уже существует
         """
         # Проверяем уникальность имени
-        for user in self._users.values():
-            if user.username == username:
-                raise ValueError(
-                    f"Пользователь с именем '{username}' уже существует"
-                )
+        if username in self._username_to_id:
+            raise ValueError(
+                f"Пользователь с именем '{username}' уже существует"
+            )
 
         # Генерируем новый ID
-        user_id = max(self._users.keys(), default=0) + 1
+        user_id = self._next_user_id
 
         # Создаём пользователя
         hashed_password, salt = User.hash_password(password)
@@ -98,6 +155,8 @@ class UserManager:
         )
 
         self._users[user_id] = user
+        self._username_to_id[username] = user_id
+        self._next_user_id = user_id + 1
         self._save_users()
 
         return user
@@ -124,10 +183,10 @@ class UserManager:
         Returns:
             Объект User или None
         """
-        for user in self._users.values():
-            if user.username == username:
-                return user
-        return None
+        user_id = self._username_to_id.get(username)
+        if user_id is None:
+            return None
+        return self._users.get(user_id)
 
     @log_action("LOGIN")
     def authenticate(self, username: str, password: str) -> User | None:
@@ -160,25 +219,42 @@ class PortfolioManager:
         ensure_data_dir()
         self._user_manager = user_manager
         self._portfolios: dict[int, Portfolio] = {}
+        # Есть несохранённые изменения (запись откладывается до flush)
+        self._dirty = False
         self._load_portfolios()
+        # Несохранённые изменения записываются при завершении процесса
+        atexit.register(self.flush)
 
     def _load_portfolios(self) -> None:
-        """Загрузить портфели из JSON файла."""
+        """
+        Загрузить портфели из JSON файла.
+
+        Файл хранит словарь {user_id: {"wallets": ...}}; файлы
+        старого формата (список портфелей с полем user_id) тоже
+        читаются и при следующем сохранении переписываются в новом.
+        """
         portfolios_data = load_json("portfolios.json")
 
-        for portfolio_data in portfolios_data:
-            user_id = portfolio_data["user_id"]
-            wallets_dict: dict[str, Wallet] = {}
+        if isinstance(portfolios_data, dict):
+            records = (
+                (int(user_id), portfolio_data)
+                for user_id, portfolio_data in portfolios_data.items()
+            )
+        else:
+            records = (
+                (portfolio_data["user_id"], portfolio_data)
+                for portfolio_data in portfolios_data
+            )
 
-            for (
-                currency_code,
-                wallet_data,
-            ) in portfolio_data["wallets"].items():
-                wallet = Wallet(
+        for user_id, portfolio_data in records:
+            wallets_dict = {
+                currency_code: Wallet(
                     currency_code=currency_code,
                     balance=wallet_data.get("balance", 0.0),
                 )
-                wallets_dict[currency_code] = wallet
+                for currency_code, wallet_data
+                in portfolio_data["wallets"].items()
+            }
 
             portfolio = Portfolio(
                 user_id=user_id, wallets=wallets_dict
@@ -192,25 +268,21 @@ class PortfolioManager:
 
     def _save_portfolios(self) -> None:
         """Сохранить портфели в JSON файл."""
-        portfolios_data = []
-
-        for portfolio in self._portfolios.values():
-            wallets_dict = {}
-
-            for currency_code, wallet in portfolio.wallets.items():
-                wallets_dict[currency_code] = {
-                    "currency_code": currency_code,
-                    "balance": wallet.balance,
-                }
-
-            portfolios_data.append(
-                {
-                    "user_id": portfolio.user_id,
-                    "wallets": wallets_dict,
-                }
-            )
+        # Ключ — user_id, как и в памяти; код валюты уже является
+        # ключом кошелька и отдельно не дублируется
+        portfolios_data = {
+            str(user_id): {
+                "wallets": {
+                    currency_code: {"balance": wallet.balance}
+                    for currency_code, wallet in portfolio.wallets.items()
+                },
+            }
+            for user_id, portfolio in self._portfolios.items()
+        }
 
-        save_json("portfolios.json", portfolios_data)
+        # Балансы — единственные данные, которые нельзя восстановить,
+        # поэтому только они записываются с fsync
+        save_json_durable("portfolios.json", portfolios_data)
 
     def get_portfolio(self, user_id: int) -> Portfolio:
         """
@@ -228,7 +300,7 @@ class PortfolioManager:
             if user:
                 portfolio.set_user(user)
             self._portfolios[user_id] = portfolio
-            self._save_portfolios()
+            self._dirty = True
 
         return self._portfolios[user_id]
 
@@ -236,11 +308,20 @@ class PortfolioManager:
         """
         Сохранить портфель.
 
+        Портфель только помечается изменённым; файл перезаписывается
+        один раз при вызове flush() (или при завершении процесса).
+
         Args:
             portfolio: Объект портфеля для сохранения
         """
         self._portfolios[portfolio.user_id] = portfolio
-        self._save_portfolios()
+        self._dirty = True
+
+    def flush(self) -> None:
+        """Записать портфели в файл, если есть несохранённые изменения."""
+        if self._dirty:
+            self._save_portfolios()
+            self._dirty = False
 
     @log_action("BUY", verbose=True)
     def buy_currency(
@@ -249,7 +330,7 @@ class PortfolioManager:
         currency: str,
         amount: float,
         rate_manager: "RateManager",
-    ) -> tuple[float, float]:
+    ) -> tuple[float, float, Wallet]:
         """
         Купить валюту (увеличить баланс).
 
@@ -260,7 +341,7 @@ class PortfolioManager:
             rate_manager: Менеджер курсов
 
         Returns:
-            Кортеж (курс, стоимость в USD)
+            Кортеж (курс, стоимость в USD, обновлённый кошелёк)
 
         Raises:
             InvalidCurrencyCodeError: Если код валюты некорректен
@@ -285,22 +366,19 @@ class PortfolioManager:
             raise RateUnavailableError(currency_code, "USD") from None
 
         # Добавляем валюту, если её нет
-        if currency_code not in portfolio.wallets:
-            portfolio.add_currency(currency_code)
-
+        # (get_wallet не копирует словарь кошельков, в отличие от wallets)
         wallet = portfolio.get_wallet(currency_code)
         if wallet is None:
-            raise ValueError(
-                f"Не удалось создать кошелёк {currency_code}"
-            )
+            wallet = portfolio.add_currency(currency_code)
 
-        wallet.deposit(amount)
+        # Сумма уже проверена выше
+        wallet._deposit_fast(amount)
         self.save_portfolio(portfolio)
 
         # Стоимость в USD
         cost_usd = amount * rate
 
-        return rate, cost_usd
+        return rate, cost_usd, wallet
 
     @log_action("SELL", verbose=True)
     def sell_currency(
@@ -309,7 +387,7 @@ class PortfolioManager:
         currency: str,
         amount: float,
         rate_manager: "RateManager",
-    ) -> tuple[float, float]:
+    ) -> tuple[float, float, Wallet]:
         """
         Продать валюту (уменьшить баланс).
 
@@ -320,7 +398,7 @@ class PortfolioManager:
             rate_manager: Менеджер курсов
 
         Returns:
-            Кортеж (курс, выручка в USD)
+            Кортеж (курс, выручка в USD, обновлённый кошелёк)
 
         Raises:
             InvalidCurrencyCodeError: Если код валюты некорректен
@@ -364,34 +442,104 @@ class PortfolioManager:
         # Выручка в USD
         revenue_usd = amount * rate
 
-        return rate, revenue_usd
+        return rate, revenue_usd, wallet
 
 
 class RateManager:
     """Менеджер для работы с курсами валют."""
 
+    # Число несохранённых обновлений, после которого файл курсов
+    # записывается, не дожидаясь flush() при завершении
+    FLUSH_THRESHOLD = 16
+
     def __init__(self) -> None:
         """Инициализация менеджера курсов."""
         ensure_data_dir()
-        self._rates: dict[str, dict] = {}
+        # Курсы по ключу (from_currency, to_currency)
+        self._rates: dict[tuple[str, str], dict] = {}
+        # Время обновления курсов по часам time.monotonic()
+        # (None — метки нет/ошибка); хранится отдельно, чтобы не
+        # попасть в файл, и не зависит от перевода системных часов
+        self._updated_mono: dict[tuple[str, str], float | None] = {}
+        # Значения курсов в обе стороны: обратный курс вычисляется
+        # заранее, и get_rate — один поиск в словаре (в файл не пишется)
+        self._rate_values: dict[tuple[str, str], float] = {}
+        # Прочие записи файла (например, кеш Parser Service),
+        # которые сохраняются без изменений
+        self._extra: dict[str, Any] = {}
+        # Источник несохранённых изменений (None — изменений нет)
+        self._dirty_source: str | None = None
+        # Счётчик обновлений курсов с момента последней записи
+        self._pending_updates = 0
         self._load_rates()
+        # Несохранённые изменения записываются при завершении процесса
+        atexit.register(self.flush)
 
     def _load_rates(self) -> None:
         """Загрузить курсы из JSON файла."""
         rates_data = load_json("rates.json")
-        # Убираем служебные поля из основного словаря
-        self._rates = {
-            k: v for k, v in rates_data.items()
-            if k not in ("source", "last_refresh")
-        }
+        wall_now = time.time()
+        mono_now = time.monotonic()
+
+        for key, value in rates_data.items():
+            # Убираем служебные поля
+            if key in ("source", "last_refresh"):
+                continue
+
+            from_currency, sep, to_currency = key.partition("_")
+            if sep and isinstance(value, dict) and "rate" in value:
+                pair = (sys.intern(from_currency), sys.intern(to_currency))
+                self._rates[pair] = value
+                updated_ts = self._parse_timestamp(value.get("updated_at"))
+                # Переводим метку файла в монотонные часы, сохраняя
+                # возраст курса (метки из будущего считаем свежими)
+                self._updated_mono[pair] = (
+                    None
+                    if updated_ts is None
+                    else mono_now - max(0.0, wall_now - updated_ts)
+                )
+                self._index_rate(pair, value["rate"])
+            else:
+                self._extra[key] = value
 
     def _save_rates(self, source: str = "ParserService") -> None:
         """Сохранить курсы в JSON файл."""
-        rates_data = self._rates.copy()
+        rates_data = dict(self._extra)
+        # На диске пары хранятся строками вида "BTC_USD"
+        rates_data.update(
+            {
+                f"{from_currency}_{to_currency}": entry
+                for (from_currency, to_currency), entry
+                in self._rates.items()
+            }
+        )
         rates_data["source"] = source
         rates_data["last_refresh"] = datetime.now().isoformat()
         save_json("rates.json", rates_data)
 
+    def flush(self) -> None:
+        """Записать курсы в файл, если есть несохранённые изменения."""
+        if self._dirty_source is not None:
+            self._save_rates(self._dirty_source)
+            self._dirty_source = None
+            self._pending_updates = 0
+
+    def _mark_dirty(self, source: str, updates: int = 1) -> None:
+        """
+        Отметить курсы как несохранённые.
+
+        Файл перезаписывается сразу, только когда накопилось
+        FLUSH_THRESHOLD обновлений; иначе — при flush().
+
+        Args:
+            source: Источник изменений
+            updates: Число обновлённых курсов
+        """
+        self._dirty_source = source
+        self._pending_updates += updates
+        if self._pending_updates >= self.FLUSH_THRESHOLD:
+            self.flush()
+
     def get_rate(self, from_currency: str, to_currency: str) -> float | None:
         """
         Получить курс обмена между валютами.
@@ -407,17 +555,27 @@ class RateManager:
         if from_currency == to_currency:
             return 1.0
 
-        # Прямой курс (например, BTC_USD)
-        rate_key = f"{from_currency}_{to_currency}"
-        if rate_key in self._rates:
-            return float(self._rates[rate_key]["rate"])
+        # Прямой курс (например, BTC_USD) или заранее вычисленный
+        # обратный (1 / USD_BTC)
+        return self._rate_values.get((from_currency, to_currency))
 
-        # Обратный курс (например, USD_BTC)
-        reverse_key = f"{to_currency}_{from_currency}"
-        if reverse_key in self._rates:
-            return 1.0 / float(self._rates[reverse_key]["rate"])
+    def get_rate_entry(
+        self, from_currency: str, to_currency: str
+    ) -> dict | None:
+        """
+        Получить запись кеша для пары (прямой или обратной).
 
-        return None
+        Args:
+            from_currency: Исходная валюта
+            to_currency: Целевая валюта
+
+        Returns:
+            Словарь с полями rate/updated_at или None
+        """
+        entry = self._rates.get((from_currency, to_currency))
+        if entry is None:
+            entry = self._rates.get((to_currency, from_currency))
+        return entry
 
     def is_rate_fresh(
         self, from_currency: str, to_currency: str,
@@ -440,23 +598,35 @@ class RateManager:
 
         max_age = max_age_seconds or settings.rates_ttl_seconds
 
-        rate_key = f"{from_currency}_{to_currency}"
-        if rate_key not in self._rates:
-            reverse_key = f"{to_currency}_{from_currency}"
-            if reverse_key not in self._rates:
-                return False
-            rate_key = reverse_key
+        # Та же запись, что вернул бы get_rate_entry
+        pair = (from_currency, to_currency)
+        if pair not in self._rates:
+            pair = (to_currency, from_currency)
 
-        updated_at_str = self._rates[rate_key].get("updated_at")
-        if not updated_at_str:
+        # Метка хранится в монотонных часах: проверка — вычитание чисел
+        updated_mono = self._updated_mono.get(pair)
+        if updated_mono is None:
             return False
 
+        return time.monotonic() - updated_mono <= max_age
+
+    @staticmethod
+    def _parse_timestamp(updated_at: Any) -> float | None:
+        """
+        Разобрать ISO-метку времени курса в unix-время.
+
+        Args:
+            updated_at: Значение поля updated_at
+
+        Returns:
+            Unix-время или None, если метки нет или она некорректна
+        """
+        if not updated_at:
+            return None
         try:
-            updated_at = datetime.fromisoformat(updated_at_str)
-            age = datetime.now() - updated_at
-            return age <= timedelta(seconds=max_age)
+            return datetime.fromisoformat(updated_at).timestamp()
         except (ValueError, TypeError):
-            return False
+            return None
 
     def update_rate(
         self,
@@ -468,18 +638,90 @@ class RateManager:
         """
         Обновить курс валют.
 
+        Курс сразу доступен из памяти, файл перезаписывается при
+        вызове flush(), при завершении процесса или после
+        FLUSH_THRESHOLD накопленных обновлений.
+
         Args:
             from_currency: Исходная валюта
             to_currency: Целевая валюта
             rate: Курс обмена
             source: Источник курса
         """
-        rate_key = f"{from_currency}_{to_currency}"
-        self._rates[rate_key] = {
+        self._set_rate(from_currency, to_currency, rate)
+        self._mark_dirty(source)
+
+    def _set_rate(
+        self, from_currency: str, to_currency: str, rate: float
+    ) -> None:
+        """Записать курс в память (без сохранения в файл)."""
+        now = datetime.now()
+        pair = (from_currency, to_currency)
+        self._rates[pair] = {
             "rate": rate,
-            "updated_at": datetime.now().isoformat(),
+            "updated_at": now.isoformat(),
         }
-        self._save_rates(source)
+        self._updated_mono[pair] = time.monotonic()
+        self._index_rate(pair, rate)
+
+    def _index_rate(self, pair: tuple[str, str], rate: Any) -> None:
+        """
+        Обновить значения курса пары и обратной к ней пары.
+
+        Обратный курс выводится, только если для обратной пары нет
+        собственной записи: прямой курс приоритетнее.
+
+        Args:
+            pair: Пара (from_currency, to_currency)
+            rate: Курс из записи
+        """
+        try:
+            rate_value = float(rate)
+        except (TypeError, ValueError):
+            self._rate_values.pop(pair, None)
+            return
+
+        self._rate_values[pair] = rate_value
+        reverse = (pair[1], pair[0])
+        if reverse not in self._rates and rate_value != 0:
+            self._rate_values[reverse] = 1.0 / rate_value
+
+    def prefetch_all(
+        self,
+        currency_codes: Iterable[str],
+        to_currency: str,
+        source: str = "ParserService",
+    ) -> None:
+        """
+        Разом обновить отсутствующие и устаревшие курсы к валюте.
+
+        Все курсы запрашиваются у источника за один проход, а файл
+        курсов перезаписывается один раз (при flush). После этого
+        get_or_fetch_rate для этих пар берёт значения из кеша.
+
+        Args:
+            currency_codes: Коды исходных валют
+            to_currency: Целевая валюта
+            source: Источник курсов
+        """
+        updated = 0
+
+        for from_currency in dict.fromkeys(currency_codes):
+            if from_currency == to_currency:
+                continue
+            cached_rate = self.get_rate(from_currency, to_currency)
+            if cached_rate is not None and self.is_rate_fresh(
+                from_currency, to_currency
+            ):
+                continue
+
+            rate = self.get_fallback_rate(from_currency, to_currency)
+            if rate is not None:
+                self._set_rate(from_currency, to_currency, rate)
+                updated += 1
+
+        if updated:
+            self._mark_dirty(source, updated)
 
     def get_fallback_rate(
         self, from_currency: str, to_currency: str
@@ -494,50 +736,7 @@ class RateManager:
         Returns:
             Курс обмена или None
         """
-        # Фиксированные курсы для заглушки
-        fallback_rates: dict[str, dict[str, float]] = {
-            "USD": {
-                "USD": 1.0,
-                "EUR": 0.92,
-                "BTC": 0.000023,
-                "ETH": 0.00035,
-                "RUB": 92.0,
-            },
-            "EUR": {
-                "USD": 1.09,
-                "EUR": 1.0,
-                "BTC": 0.000025,
-                "ETH": 0.00038,
-                "RUB": 100.0,
-            },
-            "BTC": {
-                "USD": 43500.0,
-                "EUR": 40000.0,
-                "BTC": 1.0,
-                "ETH": 15.5,
-                "RUB": 4002000.0,
-            },
-            "ETH": {
-                "USD": 2800.0,
-                "EUR": 2576.0,
-                "BTC": 0.064,
-                "ETH": 1.0,
-                "RUB": 257600.0,
-            },
-            "RUB": {
-                "USD": 0.011,
-                "EUR": 0.01,
-                "BTC": 0.00000025,
-                "ETH": 0.0000039,
-                "RUB": 1.0,
-            },
-        }
-
-        if from_currency in fallback_rates:
-            if to_currency in fallback_rates[from_currency]:
-                return fallback_rates[from_currency][to_currency]
-
-        return None
+        return _FALLBACK_RATES.get(from_currency, _NO_RATES).get(to_currency)
 
     def get_or_fetch_rate(
         self, from_currency: str, to_currency: str
@@ -562,20 +761,46 @@ class RateManager:
         ):
             return rate
 
-        # Попытка получить курс из заглушки/API
-        try:
-            fallback_rate = self.get_fallback_rate(from_currency, to_currency)
-            if fallback_rate is not None:
-                self.update_rate(from_currency, to_currency, fallback_rate)
-                return fallback_rate
-        except Exception as e:
-            # При ошибке обращения к API выбрасываем ApiRequestError
-            raise ApiRequestError(
-                f"Не удалось получить курс {from_currency}→{to_currency}: {e}"
-            ) from e
+        # Заглушка — поиск в словаре и исключений не выбрасывает;
+        # при переходе на сетевой источник оборачивать только его вызов
+        fallback_rate = self.get_fallback_rate(from_currency, to_currency)
+        if fallback_rate is not None:
+            self.update_rate(from_currency, to_currency, fallback_rate)
+            return fallback_rate
 
         # Если курс недоступен
         raise ApiRequestError(
             f"Курс {from_currency}→{to_currency} недоступен"
         )
 
+    def get_or_fetch_rates(
+        self, currency_codes: Iterable[str], to_currency: str
+    ) -> dict[str, float | None]:
+        """
+        Получить курсы набора валют к одной целевой валюте.
+
+        Каждая уникальная пара разрешается только один раз,
+        недостающие курсы предварительно загружаются одним пакетом.
+
+        Args:
+            currency_codes: Коды исходных валют
+            to_currency: Целевая валюта
+
+        Returns:
+            Словарь {код валюты: курс}; None, если курс недоступен
+        """
+        codes = list(dict.fromkeys(currency_codes))
+        self.prefetch_all(codes, to_currency)
+
+        rates: dict[str, float | None] = {}
+
+        for currency_code in codes:
+            try:
+                rates[currency_code] = self.get_or_fetch_rate(
+                    currency_code, to_currency
+                )
+            except ApiRequestError:
+                rates[currency_code] = None
+
+        return rates
+
@@ -1,6 +1,12 @@
 """Вспомогательные функции для работы с данными."""
 
+import contextlib
 import json
+import os
+import re
+import stat
+import tempfile
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
@@ -13,6 +19,18 @@ from valutatrade_hub.core.exceptions import (
 # Базовый путь к директории с данными
 DATA_DIR = Path(__file__).parent.parent.parent / "data"
 
+# Общий кодировщик: json.dumps с нестандартными параметрами создаёт
+# новый JSONEncoder при каждом вызове
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+# Формат нормализованного кода валюты (совпадает с Currency)
+_CURRENCY_CODE_RE = re.compile(r"[A-Z0-9]{2,5}")
+
+# Содержимое прочитанных файлов: {имя файла: (mtime_ns, размер, байты)}.
+# Хранятся байты, а не разобранные данные, чтобы вызывающие не
+# делили между собой изменяемые объекты
+_FILE_CACHE: dict[str, tuple[int, int, bytes]] = {}
+
 
 def load_json(file_name: str) -> Any:
     """
@@ -30,7 +48,10 @@ def load_json(file_name: str) -> Any:
     """
     file_path = DATA_DIR / file_name
 
-    if not file_path.exists():
+    try:
+        file_stat = file_path.stat()
+    except FileNotFoundError:
+        _FILE_CACHE.pop(file_name, None)
         # Если файл не существует, возвращаем значение по умолчанию
         if file_name.endswith(".json"):
             if "rates" in file_name:
@@ -38,33 +59,138 @@ def load_json(file_name: str) -> Any:
             return []
         return {}
 
-    with open(file_path, encoding="utf-8") as f:
-        return json.load(f)
+    # Неизменившийся файл (те же mtime и размер) повторно не читается
+    cached = _FILE_CACHE.get(file_name)
+    if (
+        cached is not None
+        and cached[0] == file_stat.st_mtime_ns
+        and cached[1] == file_stat.st_size
+    ):
+        raw = cached[2]
+    else:
+        raw = file_path.read_bytes()
+        _FILE_CACHE[file_name] = (
+            file_stat.st_mtime_ns, file_stat.st_size, raw
+        )
+
+    # Разбираем за один вызов
+    return json.loads(raw)
 
 
-def save_json(file_name: str, data: Any) -> None:
+def save_json(file_name: str, data: Any, durable: bool = False) -> None:
     """
     Сохранить данные в JSON файл.
 
+    Данные сбрасываются на диск (fsync) только при durable=True:
+    для большинства файлов достаточно атомарной подмены.
+
     Args:
         file_name: Имя файла в директории data/
         data: Данные для сохранения (должны быть сериализуемы в JSON)
+        durable: Дождаться физической записи данных на диск
 
     Raises:
         json.JSONEncodeError: Если данные не могут быть сериализованы
     """
     file_path = DATA_DIR / file_name
 
-    # Создаём директорию, если её нет
-    file_path.parent.mkdir(parents=True, exist_ok=True)
+    # Создаём директорию, если её нет (один раз за процесс)
+    ensure_data_dir()
+
+    # Сериализуем целиком и пишем атомарно
+    raw = _JSON_ENCODER.encode(data).encode("utf-8")
+    write_atomic(file_path, raw, durable)
+
+    # Записанное содержимое сразу попадает в кеш чтения
+    file_stat = file_path.stat()
+    _FILE_CACHE[file_name] = (
+        file_stat.st_mtime_ns, file_stat.st_size, raw
+    )
+
+
+def save_json_durable(file_name: str, data: Any) -> None:
+    """
+    Сохранить данные в JSON файл с гарантией записи на диск.
+
+    Args:
+        file_name: Имя файла в директории data/
+        data: Данные для сохранения (должны быть сериализуемы в JSON)
+    """
+    save_json(file_name, data, durable=True)
+
+
+def write_atomic(
+    file_path: Path, data: bytes, durable: bool = False
+) -> None:
+    """
+    Атомарно записать файл.
+
+    Данные пишутся во временный файл с уникальным именем в той же
+    директории, который затем подменяет целевой: при сбое на диске
+    остаётся либо старая, либо новая версия файла целиком, а
+    одновременные записи не мешают друг другу. Используется всеми
+    хранилищами приложения (data/, DatabaseManager, Parser Service).
+
+    Args:
+        file_path: Путь к файлу
+        data: Содержимое файла
+        durable: Вызвать fsync перед подменой файла
+    """
+    fd, temp_name = tempfile.mkstemp(
+        dir=file_path.parent, prefix=".tmp-", suffix=file_path.suffix
+    )
+
+    try:
+        try:
+            # Данные уже сериализованы — пишем прямо в дескриптор
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            if durable:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        # mkstemp создаёт файл с правами 0600 — сохраняем права
+        # заменяемого файла
+        os.chmod(temp_name, _file_mode(file_path))
+        os.replace(temp_name, file_path)
+    except BaseException:
+        # Удаляем временный файл при ошибке
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_name)
+        raise
+
+
+def _file_mode(file_path: Path) -> int:
+    """
+    Получить права доступа для перезаписываемого файла.
+
+    Args:
+        file_path: Путь к файлу
+
+    Returns:
+        Права существующего файла или 0644 для нового
+    """
+    try:
+        return stat.S_IMODE(file_path.stat().st_mode)
+    except FileNotFoundError:
+        return 0o644
+
 
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# Директория data/ уже создана в этом процессе
+_DATA_DIR_ENSURED = False
 
 
 def ensure_data_dir() -> None:
     """Убедиться, что директория data/ существует."""
+    global _DATA_DIR_ENSURED
+
+    # Менеджеры вызывают функцию при каждой инициализации —
+    # к файловой системе обращаемся только в первый раз
+    if _DATA_DIR_ENSURED:
+        return
     DATA_DIR.mkdir(parents=True, exist_ok=True)
+    _DATA_DIR_ENSURED = True
 
 
 # Путь к файлу сессии
@@ -82,11 +208,10 @@ def load_session() -> dict | None:
         return None
 
     try:
-        with open(SESSION_FILE, encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return data
-            return None
+        data = json.loads(SESSION_FILE.read_bytes())
+        if isinstance(data, dict):
+            return data
+        return None
     except (FileNotFoundError, ValueError, json.JSONDecodeError):
         return None
 
@@ -99,8 +224,9 @@ def save_session(session_data: dict) -> None:
         session_data: Данные сессии
     """
     # Сохраняем в родительскую директорию (корень проекта)
-    with open(SESSION_FILE, "w", encoding="utf-8") as f:
-        json.dump(session_data, f, ensure_ascii=False, indent=2)
+    SESSION_FILE.write_text(
+        _JSON_ENCODER.encode(session_data), encoding="utf-8"
+    )
 
 
 def clear_session() -> None:
@@ -109,10 +235,14 @@ def clear_session() -> None:
         SESSION_FILE.unlink()
 
 
+@lru_cache(maxsize=128)
 def validate_currency_code(currency_code: str) -> str:
     """
     Валидировать код валюты и нормализовать его.
 
+    Набор кодов невелик и повторяется от операции к операции, поэтому
+    результат кешируется; ошибки не кешируются и возникают каждый раз.
+
     Args:
         currency_code: Код валюты для валидации
 
@@ -129,8 +259,10 @@ def validate_currency_code(currency_code: str) -> str:
 
     code_clean = currency_code.strip().upper()
 
-    # Используем валидацию из Currency
-    Currency._validate_code(code_clean)
+    # Корректный код проверяется одним регулярным выражением;
+    # подробная диагностика Currency — только для ошибочных кодов
+    if not _CURRENCY_CODE_RE.fullmatch(code_clean):
+        Currency._validate_code(code_clean)
 
     return code_clean
 
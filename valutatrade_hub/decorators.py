@@ -1,6 +1,8 @@
 """Декораторы для расширения функциональности."""
 
 import functools
+import inspect
+import logging
 import time
 from collections.abc import Callable
 from datetime import datetime
@@ -11,6 +13,54 @@ from valutatrade_hub.logging_config import get_logger
 logger = get_logger(__name__)
 
 
+def _format_fields(
+    started_at: datetime,
+    action: str,
+    username: str,
+    fields: dict[str, Any],
+) -> tuple[str, list[Any]]:
+    """
+    Собрать формат сообщения log_action и аргументы для него.
+
+    Значения не форматируются: logging подставит их, только если
+    сообщение действительно будет записано.
+
+    Args:
+        started_at: Время начала операции
+        action: Имя действия
+        username: Имя пользователя
+        fields: Необязательные поля (user_id, currency, amount,
+            rate, base); пустые пропускаются
+
+    Returns:
+        Кортеж (формат в стиле %, список аргументов)
+    """
+    fmt = "%s action=%s user='%s'"
+    fmt_args: list[Any] = [started_at.isoformat(), action, username]
+
+    if fields["user_id"] is not None:
+        fmt += " user_id=%s"
+        fmt_args.append(fields["user_id"])
+
+    if fields["currency"]:
+        fmt += " currency='%s'"
+        fmt_args.append(fields["currency"])
+
+    if isinstance(fields["amount"], int | float):
+        fmt += " amount=%.4f"
+        fmt_args.append(fields["amount"])
+
+    if isinstance(fields["rate"], int | float):
+        fmt += " rate=%.2f"
+        fmt_args.append(fields["rate"])
+
+    if fields["base"]:
+        fmt += " base='%s'"
+        fmt_args.append(fields["base"])
+
+    return fmt, fmt_args
+
+
 def log_action(
     action_name: str | None = None,
     verbose: bool = False,
@@ -38,43 +88,58 @@ def log_action(
     """
 
     def decorator(func: Callable) -> Callable:
+        # Имя действия и позиции параметров вычисляются один раз,
+        # при декорировании, а не при каждом вызове
+        action = action_name or func.__name__.upper()
+        param_names = list(inspect.signature(func).parameters)
+
+        def locate(*names: str) -> tuple[int | None, tuple[str, ...]]:
+            """Найти позицию первого из параметров в сигнатуре."""
+            for name in names:
+                if name in param_names:
+                    return param_names.index(name), names
+            return None, names
+
+        user_id_at = locate("user_id")
+        username_at = locate("username")
+        currency_at = locate("currency", "currency_code")
+        amount_at = locate("amount")
+        rate_at = locate("rate")
+        base_at = locate("base")
+
+        # Часто используемые в обёртке объекты связываются с локальными
+        # именами замыкания, чтобы не искать их в глобалах при вызове
+        now = datetime.now
+        is_enabled_for = logger.isEnabledFor
+        log_error = logger.error
+        log_info_msg = logger.info
+        error_level = logging.ERROR
+        info_level = logging.INFO
+
+        def extract(
+            args: tuple,
+            kwargs: dict[str, Any],
+            location: tuple[int | None, tuple[str, ...]],
+            default: Any = None,
+        ) -> Any:
+            """Достать значение параметра по позиции или имени."""
+            index, names = location
+            if index is not None and index < len(args):
+                return args[index]
+            for name in names:
+                if name in kwargs:
+                    return kwargs[name]
+            return default
+
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
-            action = action_name or func.__name__.upper()
-
-            # Извлекаем параметры из args/kwargs
-            user_id = None
-            username = "anonymous"
-            currency_code = None
-            amount = None
-            rate = None
-            base = "USD"
-
-            # Для методов usecases: первый арг - self, второй - user_id
-            if len(args) > 1:
-                user_id = args[1] if isinstance(args[1], int) else None
-                if len(args) > 2:
-                    currency_code = (
-                        args[2]
-                        if isinstance(args[2], str)
-                        else kwargs.get("currency")
-                    )
-                if len(args) > 3:
-                    amount = (
-                        args[3]
-                        if isinstance(args[3], int | float)
-                        else kwargs.get("amount")
-                    )
-
-            # Извлекаем из kwargs
-            currency_code = (
-                currency_code
-                or kwargs.get("currency")
-                or kwargs.get("currency_code")
-            )
-            amount = amount or kwargs.get("amount")
-            rate = kwargs.get("rate")
-            base = kwargs.get("base", "USD")
+            # Извлекаем параметры из args/kwargs по сигнатуре функции
+            user_id = extract(args, kwargs, user_id_at)
+            username = extract(args, kwargs, username_at, "anonymous")
+            currency_code = extract(args, kwargs, currency_at)
+            amount = extract(args, kwargs, amount_at)
+            rate = extract(args, kwargs, rate_at)
+            base = extract(args, kwargs, base_at, "USD")
 
             # Для CLI методов: ищем current_user
             if args and hasattr(args[0], "current_user"):
@@ -83,92 +148,92 @@ def log_action(
                     username = user.username
                     user_id = user.user_id
 
-            # Формируем базовое сообщение
-            timestamp = datetime.now().isoformat()
-            log_parts = [
-                f"{timestamp}",
-                f"action={action}",
-                f"user='{username}'",
-            ]
-
-            if user_id:
-                log_parts.append(f"user_id={user_id}")
+            # Если даже ERROR отключён, логировать нечего
+            if not is_enabled_for(error_level):
+                return func(*args, **kwargs)
+            log_info = is_enabled_for(info_level)
 
-            if currency_code:
-                log_parts.append(f"currency='{currency_code}'")
-
-            if amount is not None:
-                log_parts.append(f"amount={amount:.4f}")
-
-            if rate is not None:
-                log_parts.append(f"rate={rate:.2f}")
-
-            if base:
-                log_parts.append(f"base='{base}'")
-
-            # Сохраняем состояние для verbose режима
-            old_state = None
+            started_at = now()
+            fields = {
+                "user_id": user_id,
+                "currency": currency_code,
+                "amount": amount,
+                "rate": rate,
+                "base": base,
+            }
 
             try:
-                # Для buy/sell сохраняем старое состояние кошелька
-                if verbose and action in ("BUY", "SELL") and currency_code:
-                    if args and hasattr(args[0], "get_portfolio"):
-                        portfolio = args[0].get_portfolio(user_id)
-                        wallet = portfolio.get_wallet(currency_code)
-                        if wallet:
-                            old_state = wallet.balance
+                # Для buy/sell сохраняем кошелёк до операции
+                # (только если сообщение INFO будет записано)
+                wallet = None
+                old_state = None
+                if (
+                    verbose
+                    and log_info
+                    and action in ("BUY", "SELL")
+                    and currency_code
+                    and args
+                    and hasattr(args[0], "get_portfolio")
+                ):
+                    portfolio = args[0].get_portfolio(user_id)
+                    wallet = portfolio.get_wallet(currency_code)
+                    if wallet is not None:
+                        old_state = wallet.balance
 
                 result = func(*args, **kwargs)
 
-                # Извлекаем rate и стоимость из результата (для buy/sell)
-                if isinstance(result, tuple) and len(result) == 2:
-                    result_rate, cost_or_revenue = result
-                    rate = result_rate
-                    log_parts = [
-                        p for p in log_parts if not p.startswith("rate=")
-                    ]
-                    log_parts.append(f"rate={rate:.2f}")
-                    if action == "BUY":
-                        log_parts.append(
-                            f"cost_usd={cost_or_revenue:.2f}"
-                        )
-                    elif action == "SELL":
-                        log_parts.append(
-                            f"revenue_usd={cost_or_revenue:.2f}"
-                        )
-
-                # Добавляем verbose информацию
-                if verbose and old_state is not None:
-                    if args and hasattr(args[0], "get_portfolio"):
-                        portfolio = args[0].get_portfolio(user_id)
-                        wallet = portfolio.get_wallet(currency_code)
-                        if wallet:
-                            new_state = wallet.balance
-                            log_parts.append(
-                                f"balance_before={old_state:.4f}"
-                            )
-                            log_parts.append(
-                                f"balance_after={new_state:.4f}"
-                            )
-
-                log_parts.append("result=OK")
-                logger.info(" ".join(log_parts))
-
-                return result
-
             except Exception as e:
-                error_type = type(e).__name__
-                error_message = str(e)
-
-                log_parts.append("result=ERROR")
-                log_parts.append(f"error_type={error_type}")
-                log_parts.append(f"error_message='{error_message}'")
-
-                logger.error(" ".join(log_parts), exc_info=True)
+                fmt, fmt_args = _format_fields(
+                    started_at, action, username, fields
+                )
+                log_error(
+                    fmt + " result=ERROR error_type=%s error_message='%s'",
+                    *fmt_args,
+                    type(e).__name__,
+                    e,
+                    exc_info=True,
+                )
 
                 # Декоратор НЕ глотает исключения - пробрасывает дальше
                 raise
 
+            if not log_info:
+                return result
+
+            extra_fmt = ""
+            extra_args: list[Any] = []
+
+            # Извлекаем rate и стоимость из результата (для buy/sell:
+            # курс, сумма в USD и, опционально, обновлённый кошелёк)
+            if isinstance(result, tuple) and len(result) in (2, 3):
+                result_rate, cost_or_revenue = result[:2]
+                # Курс из результата выводится после остальных полей
+                fields["rate"] = None
+                extra_fmt += " rate=%.2f"
+                extra_args.append(result_rate)
+                if action == "BUY":
+                    extra_fmt += " cost_usd=%.2f"
+                    extra_args.append(cost_or_revenue)
+                elif action == "SELL":
+                    extra_fmt += " revenue_usd=%.2f"
+                    extra_args.append(cost_or_revenue)
+
+            # Добавляем verbose информацию: операция меняет тот же
+            # объект кошелька, поэтому повторный поиск не нужен
+            if old_state is not None:
+                extra_fmt += " balance_before=%.4f balance_after=%.4f"
+                extra_args.extend((old_state, wallet.balance))
+
+            fmt, fmt_args = _format_fields(
+                started_at, action, username, fields
+            )
+            # Форматирование откладывается до записи сообщения
+            log_info_msg(
+                fmt + extra_fmt + " result=OK", *fmt_args, *extra_args
+            )
+
+            return result
+
         return wrapper
 
     return decorator
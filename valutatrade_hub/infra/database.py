@@ -1,34 +1,29 @@
-"""Абстракция над JSON-хранилищем (Singleton)."""
+"""Абстракция над JSON-хранилищем.
+
+Единственный экземпляр — объект db уровня модуля.
+"""
 
 import json
 from pathlib import Path
 from typing import Any
 
+from valutatrade_hub.core.utils import write_atomic
 from valutatrade_hub.infra.settings import settings
 
+# Общий кодировщик вместо нового JSONEncoder на каждый json.dumps
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
 
-class DatabaseManager:
-    """Singleton для управления JSON-хранилищем данных."""
 
-    _instance: "DatabaseManager | None" = None
-    _initialized: bool = False
+class DatabaseManager:
+    """Управление JSON-хранилищем данных."""
 
-    def __new__(cls) -> "DatabaseManager":
-        """Создать единственный экземпляр DatabaseManager."""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    __slots__ = ("data_dir",)
 
     def __init__(self) -> None:
-        """Инициализация менеджера базы данных (только один раз)."""
-        if self._initialized:
-            return
-
+        """Инициализация менеджера базы данных."""
         self.data_dir = Path(settings.data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
-        self._initialized = True
-
     def load(self, table_name: str) -> Any:
         """
         Загрузить данные из таблицы (JSON файла).
@@ -45,14 +40,17 @@ class DatabaseManager:
         """
         file_path = self.data_dir / f"{table_name}.json"
 
-        if not file_path.exists():
+        # Отсутствие файла выясняется при открытии, без отдельного stat
+        try:
+            raw = file_path.read_bytes()
+        except FileNotFoundError:
             # Возвращаем значение по умолчанию
             if table_name == "rates":
                 return {}
             return []
 
-        with open(file_path, encoding="utf-8") as f:
-            return json.load(f)
+        # Разбираем файл целиком за один вызов
+        return json.loads(raw)
 
     def save(self, table_name: str, data: Any) -> None:
         """
@@ -65,13 +63,12 @@ class DatabaseManager:
         Raises:
             json.JSONEncodeError: Если данные не могут быть сериализованы
         """
+        # Директория data/ создана при инициализации
         file_path = self.data_dir / f"{table_name}.json"
 
-        # Создаём директорию, если её нет
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # json.dump пишет по фрагменту на каждый токен; сериализуем
+        # целиком и пишем атомарно одной операцией
+        write_atomic(file_path, _JSON_ENCODER.encode(data).encode("utf-8"))
 
     def table_exists(self, table_name: str) -> bool:
         """
@@ -1,9 +1,8 @@
-"""Настройки приложения (Singleton).
+"""Настройки приложения.
 
-Реализация через __new__ выбрана для простоты и читабельности.
-Это стандартный паттерн для Python, не требует метаклассов
-и легко понимается. Гарантирует единственный экземпляр
-даже при множественных импортах.
+Единственный экземпляр настроек — объект settings уровня модуля:
+модуль импортируется один раз, поэтому все импорты получают один
+и тот же объект без отдельной реализации Singleton.
 """
 
 from pathlib import Path
@@ -11,36 +10,42 @@ from typing import Any
 
 
 class SettingsLoader:
-    """Singleton для загрузки и управления настройками приложения.
+    """Загрузка и управление настройками приложения.
 
-    Гарантирует единственный экземпляр в приложении.
-    Используется для централизованного доступа к конфигурации.
+    Используется для централизованного доступа к конфигурации
+    через экземпляр settings этого модуля.
     """
 
-    _instance: "SettingsLoader | None" = None
-    _initialized: bool = False
-
-    def __new__(cls) -> "SettingsLoader":
-        """Создать единственный экземпляр SettingsLoader.
-
-        Returns:
-            Единственный экземпляр SettingsLoader
-        """
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    # Фиксированный набор настроек: атрибуты хранятся в слотах,
+    # а не в __dict__ экземпляра
+    __slots__ = (
+        "project_root",
+        "data_dir",
+        "session_file",
+        "session_ttl_seconds",
+        "rates_ttl_seconds",
+        "rate_cache_max_age_minutes",
+        "default_base_currency",
+        "log_level",
+        "log_format",
+        "log_file",
+        "log_max_bytes",
+        "log_backup_count",
+        "api_timeout_seconds",
+        "api_retry_attempts",
+    )
 
     def __init__(self) -> None:
-        """Инициализация настроек (только один раз)."""
-        if self._initialized:
-            return
-
+        """Инициализация настроек."""
         # Путь к корню проекта
         self.project_root = Path(__file__).parent.parent.parent
 
         # Пути к данным
         self.data_dir = self.project_root / "data"
         self.session_file = self.project_root / ".session.json"
+        # Время жизни сессии, в течение которого пользователь берётся
+        # из файла сессии без чтения users.json
+        self.session_ttl_seconds = 3600  # 1 час
 
         # Настройки курсов валют
         self.rates_ttl_seconds = 300  # 5 минут в секундах
@@ -66,8 +71,6 @@ class SettingsLoader:
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
 
-        self._initialized = True
-
     def get(self, key: str, default: Any = None) -> Any:
         """
         Получить значение настройки.
@@ -84,11 +87,9 @@ class SettingsLoader:
     def reload(self) -> None:
         """Перезагрузить настройки.
 
-        Сбрасывает флаг инициализации и повторно инициализирует
-        все настройки. Полезно при изменении конфигурации
-        во время выполнения.
+        Повторно инициализирует все настройки. Полезно при
+        изменении конфигурации во время выполнения.
         """
-        self._initialized = False
         self.__init__()
 
 
@@ -2,14 +2,31 @@
 
 Используется строковый формат для читабельности.
 Поддерживается ротация файлов по размеру.
+Запись в файл выполняется в фоновом потоке через очередь.
 """
 
+import atexit
 import logging
 import logging.handlers
+import queue
 from pathlib import Path
 
 from valutatrade_hub.infra.settings import settings
 
+# Фоновый поток, который пишет записи из очереди в файл логов
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _stop_listener() -> None:
+    """Остановить фоновую запись логов, дописав оставшиеся записи."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
 
 def setup_logging(
     level: str | None = None,
@@ -25,6 +42,8 @@ def setup_logging(
         format_string: Формат логов (не используется,
             оставлен для совместимости)
     """
+    global _listener
+
     log_level = level or settings.log_level
     log_file_path = log_file or settings.log_file
 
@@ -61,12 +80,29 @@ def setup_logging(
 
     # Удаляем существующие обработчики
     root_logger.handlers.clear()
+    _stop_listener()
+
+    # Файловый обработчик работает в фоновом потоке: вызов логгера
+    # только кладёт запись в очередь, запись на диск и проверка
+    # ротации происходят вне вызывающего кода
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(file_handler.level)
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, respect_handler_level=True
+    )
+    _listener.start()
 
-    # Добавляем новые обработчики
-    root_logger.addHandler(file_handler)
+    # Добавляем новые обработчики (консоль — синхронно, чтобы
+    # сообщения не перемешивались с выводом CLI)
+    root_logger.addHandler(queue_handler)
     root_logger.addHandler(console_handler)
 
 
+# Оставшиеся в очереди записи дописываются при завершении процесса
+atexit.register(_stop_listener)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Получить логгер с указанным именем.
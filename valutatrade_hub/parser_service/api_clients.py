@@ -1,17 +1,81 @@
 """Клиенты для работы с внешними API."""
 
+import json
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, ClassVar
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.infra.settings import settings
 from valutatrade_hub.parser_service.config import config
 
 
+def build_session() -> requests.Session:
+    """
+    Создать HTTP-сессию с пулом соединений и повторами запросов.
+
+    Соединения переиспользуются между запросами (keep-alive), а
+    ответы 429 и 5xx повторяются на уровне HTTP-адаптера. Ошибки
+    подключения и таймауты не повторяются: недоступный API стоит
+    одного таймаута, а не таймаута на каждую попытку.
+
+    Returns:
+        Настроенная сессия requests
+    """
+    retry = Retry(
+        total=settings.api_retry_attempts,
+        status=settings.api_retry_attempts,
+        # connect=0 сохраняет ConnectTimeout у requests, read=False
+        # передаёт ReadTimeout как есть, а не в виде ConnectionError
+        connect=0,
+        read=False,
+        other=0,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # Retry-After у 429 не ограничен сверху — паузу задаёт
+        # только backoff_factor
+        respect_retry_after_header=False,
+        # После исчерпания повторов возвращаем последний ответ:
+        # его статус разбирается в _make_request
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4, pool_maxsize=16, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 class BaseApiClient(ABC):
     """Абстрактный базовый класс для API клиентов."""
 
+    # Общая для всех клиентов сессия: TCP/TLS-соединения не
+    # устанавливаются заново при каждом запросе
+    _session: ClassVar[requests.Session] = build_session()
+
+    def __init__(self, session: requests.Session | None = None) -> None:
+        """
+        Инициализация клиента.
+
+        Args:
+            session: HTTP-сессия (если None, используется общая)
+        """
+        if session is not None:
+            self._session = session
+        # Последние ответы по запросам: {(url, params): (ETag, JSON)}.
+        # Повторный запрос отправляется условным (If-None-Match), и
+        # при ответе 304 тело не загружается и не разбирается заново
+        self._etag_cache: dict[
+            tuple[str, tuple[tuple[str, Any], ...]],
+            tuple[str, dict[str, Any]],
+        ] = {}
+
     @abstractmethod
     def fetch_rates(self) -> dict[str, float]:
         """
@@ -42,14 +106,30 @@ class BaseApiClient(ABC):
         Raises:
             ApiRequestError: Если запрос не удался
         """
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        cached = self._etag_cache.get(cache_key)
+        # Accept-Encoding: gzip сессия requests отправляет по умолчанию
+        headers = {"If-None-Match": cached[0]} if cached else None
+
         try:
-            response = requests.get(
+            response = self._session.get(
                 url,
                 params=params,
+                headers=headers,
                 timeout=config.REQUEST_TIMEOUT,
             )
+            if response.status_code == 304 and cached:
+                # Данные не изменились с прошлого запроса
+                return cached[1]
             response.raise_for_status()
-            return response.json()
+            # Разбираем байты ответа напрямую: json.loads сам определяет
+            # UTF-кодировку, без декодирования в str и угадывания
+            # кодировки в response.json()
+            data = json.loads(response.content)
+            etag = response.headers.get("ETag")
+            if etag:
+                self._etag_cache[cache_key] = (etag, data)
+            return data
         except requests.exceptions.Timeout as e:
             raise ApiRequestError(
                 f"Таймаут при обращении к API: {url}"
@@ -90,20 +170,16 @@ class CoinGeckoClient(BaseApiClient):
         Raises:
             ApiRequestError: Если запрос не удался
         """
-        # Формируем список ID криптовалют
-        crypto_ids = [
-            config.CRYPTO_ID_MAP.get(code, code.lower())
-            for code in config.CRYPTO_CURRENCIES
-            if code in config.CRYPTO_ID_MAP
-        ]
-
-        if not crypto_ids:
+        # Список ID криптовалют вычислен заранее в конфигурации
+        if not config.CRYPTO_IDS:
             return {}
 
+        base_lower = config.BASE_CURRENCY_LOWER
+
         # Формируем параметры запроса
         params = {
-            "ids": ",".join(crypto_ids),
-            "vs_currencies": config.BASE_CURRENCY.lower(),
+            "ids": ",".join(config.CRYPTO_IDS),
+            "vs_currencies": base_lower,
         }
 
         # Выполняем запрос
@@ -111,20 +187,21 @@ class CoinGeckoClient(BaseApiClient):
             config.COINGECKO_URL, params=params
         )
 
-        # Преобразуем ответ в стандартный формат
+        # Преобразуем ответ в стандартный формат: один проход по
+        # ответу, код валюты по ID берётся из обратного сопоставления
         rates: dict[str, float] = {}
+        id_to_code = config.CRYPTO_ID_TO_CODE
+        # Правая часть ключа пары одинакова для всех валют ответа
+        base_suffix = "_" + config.BASE_CURRENCY
 
-        for crypto_code in config.CRYPTO_CURRENCIES:
-            crypto_id = config.CRYPTO_ID_MAP.get(crypto_code)
-            if not crypto_id or crypto_id not in response_data:
+        for crypto_id, crypto_data in response_data.items():
+            crypto_code = id_to_code.get(crypto_id)
+            if crypto_code is None or not isinstance(crypto_data, dict):
                 continue
 
-            crypto_data = response_data[crypto_id]
-            base_lower = config.BASE_CURRENCY.lower()
-
-            if base_lower in crypto_data:
-                pair_key = f"{crypto_code}_{config.BASE_CURRENCY}"
-                rates[pair_key] = float(crypto_data[base_lower])
+            rate = crypto_data.get(base_lower)
+            if rate is not None:
+                rates[crypto_code + base_suffix] = float(rate)
 
         return rates
 
@@ -132,13 +209,19 @@ class CoinGeckoClient(BaseApiClient):
 class ExchangeRateApiClient(BaseApiClient):
     """Клиент для работы с ExchangeRate-API."""
 
-    def __init__(self, api_key: str | None = None) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        session: requests.Session | None = None,
+    ) -> None:
         """
         Инициализация клиента.
 
         Args:
             api_key: API ключ (если None, используется из config)
+            session: HTTP-сессия (если None, используется общая)
         """
+        super().__init__(session)
         self.api_key = api_key or config.EXCHANGERATE_API_KEY
 
         if not self.api_key:
@@ -198,14 +281,17 @@ class ExchangeRateApiClient(BaseApiClient):
 
         # Преобразуем в стандартный формат
         rates: dict[str, float] = {}
-
-        for fiat_code in config.FIAT_CURRENCIES:
-            if fiat_code == config.BASE_CURRENCY:
-                continue  # Пропускаем базовую валюту
-
-            if fiat_code in rates_data:
-                pair_key = f"{fiat_code}_{config.BASE_CURRENCY}"
-                rates[pair_key] = float(rates_data[fiat_code])
+        base_currency = config.BASE_CURRENCY
+        # Правая часть ключа пары одинакова для всех валют ответа
+        base_suffix = "_" + base_currency
+
+        # Пересечение множеств выполняется за один вызов, без проверки
+        # каждой валюты в цикле; базовую валюту пропускаем
+        found = config.FIAT_CURRENCIES_SET & rates_data.keys()
+        found.discard(base_currency)
+        for fiat_code in sorted(found):
+            pair_key = fiat_code + base_suffix
+            rates[pair_key] = float(rates_data[fiat_code])
 
         # Если не нашли ни одного курса из списка, но rates_data не пустой,
         # пробуем взять популярные валюты
@@ -218,15 +304,15 @@ class ExchangeRateApiClient(BaseApiClient):
                 f"Доступные валюты (первые 10): {available_currencies}"
             )
             # Пробуем взять хотя бы несколько популярных валют
-            common_currencies = ["EUR", "GBP", "RUB", "JPY", "CHF", "CNY", "CAD", "AUD"]
-            for curr in common_currencies:
-                if curr in rates_data and curr != config.BASE_CURRENCY:
-                    pair_key = f"{curr}_{config.BASE_CURRENCY}"
-                    rates[pair_key] = float(rates_data[curr])
-                    logger.info(
-                        f"Добавлен курс {pair_key} = {rates[pair_key]} "
-                        f"(не в списке FIAT_CURRENCIES)"
-                    )
+            found = config.COMMON_CURRENCIES & rates_data.keys()
+            found.discard(base_currency)
+            for curr in sorted(found):
+                pair_key = curr + base_suffix
+                rates[pair_key] = float(rates_data[curr])
+                logger.info(
+                    f"Добавлен курс {pair_key} = {rates[pair_key]} "
+                    f"(не в списке FIAT_CURRENCIES)"
+                )
 
         # Если rates всё ещё пустой, значит проблема серьёзная
         if not rates:
@@ -239,4 +325,3 @@ class ExchangeRateApiClient(BaseApiClient):
             )
 
         return rates
-
@@ -1,28 +1,44 @@
 """Конфигурация Parser Service."""
 
 import os
+import re
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from pathlib import Path
+from types import MappingProxyType
 
 from valutatrade_hub.infra.settings import settings
 
+# Строка .env вида KEY=value (значение может быть в кавычках)
+_ENV_LINE_RE = re.compile(
+    r"^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t]*$",
+    re.MULTILINE,
+)
+
+# .env уже прочитан в этом процессе
+_ENV_LOADED = False
+
 
 def load_env_file() -> None:
     """Загрузить переменные окружения из .env файла (если существует)."""
+    global _ENV_LOADED
+
+    # Файл читается и разбирается один раз за процесс
+    if _ENV_LOADED:
+        return
+    _ENV_LOADED = True
+
     env_file = Path(__file__).parent.parent.parent / ".env"
-    if env_file.exists():
-        try:
-            with open(env_file, encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith("#") and "=" in line:
-                        key, value = line.split("=", 1)
-                        key = key.strip()
-                        value = value.strip().strip('"').strip("'")
-                        if key and value and key not in os.environ:
-                            os.environ[key] = value
-        except Exception:
-            pass  # Игнорируем ошибки чтения .env
+    try:
+        text = env_file.read_text(encoding="utf-8")
+    except Exception:
+        return  # Нет файла или ошибка чтения — игнорируем
+
+    for key, value in _ENV_LINE_RE.findall(text):
+        value = value.strip('"').strip("'")
+        if value:
+            # Уже заданные переменные окружения приоритетнее .env
+            os.environ.setdefault(key, value)
 
 
 # Загружаем .env файл при импорте модуля
@@ -40,14 +56,13 @@ def get_env_key(key: str, default: str = "") -> str:
     Returns:
         Значение переменной окружения
     """
-    # Сначала загружаем .env, если он есть
-    load_env_file()
+    # .env уже загружен при импорте модуля
     return os.getenv(key, default)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ParserConfig:
-    """Конфигурация для Parser Service."""
+    """Конфигурация для Parser Service (неизменяемая)."""
 
     # API ключи (загружаются из переменных окружения или .env файла)
     EXCHANGERATE_API_KEY: str = field(
@@ -84,21 +99,58 @@ class ParserConfig:
     )
 
     # Сопоставление кодов криптовалют и ID для CoinGecko
-    CRYPTO_ID_MAP: dict[str, str] = field(
-        default_factory=lambda: {
-            "BTC": "bitcoin",
-            "ETH": "ethereum",
-            "SOL": "solana",
-            "LTC": "litecoin",
-            "XRP": "ripple",
-            "ADA": "cardano",
-            "DOT": "polkadot",
-        }
+    CRYPTO_ID_MAP: Mapping[str, str] = field(
+        default_factory=lambda: MappingProxyType(
+            {
+                "BTC": "bitcoin",
+                "ETH": "ethereum",
+                "SOL": "solana",
+                "LTC": "litecoin",
+                "XRP": "ripple",
+                "ADA": "cardano",
+                "DOT": "polkadot",
+            }
+        )
     )
 
     # Сетевые параметры
     REQUEST_TIMEOUT: int = 10  # секунды
 
+    # Сбрасывать ли на диск (fsync) каждую запись журнала курсов
+    HISTORY_FSYNC: bool = False
+
+    # Популярные фиатные валюты: берутся из ответа ExchangeRate-API,
+    # если в нём не нашлось ни одной валюты из FIAT_CURRENCIES
+    COMMON_CURRENCIES: frozenset[str] = frozenset(
+        {"EUR", "GBP", "RUB", "JPY", "CHF", "CNY", "CAD", "AUD"}
+    )
+
+    # Производные значения для разбора ответов API (вычисляются
+    # один раз в __post_init__)
+    FIAT_CURRENCIES_SET: frozenset[str] = field(init=False)
+    BASE_CURRENCY_LOWER: str = field(init=False)
+    CRYPTO_IDS: tuple[str, ...] = field(init=False)
+    CRYPTO_ID_TO_CODE: Mapping[str, str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Вычислить производные значения конфигурации."""
+        # Экземпляр заморожен, поэтому поля задаются в обход
+        # __setattr__ (единственный раз — при создании)
+        set_field = object.__setattr__
+        set_field(self, "BASE_CURRENCY_LOWER", self.BASE_CURRENCY.lower())
+        set_field(
+            self, "FIAT_CURRENCIES_SET", frozenset(self.FIAT_CURRENCIES)
+        )
+        # ID отслеживаемых криптовалют и обратное сопоставление
+        # ID -> код для разбора ответа CoinGecko
+        id_to_code = {
+            self.CRYPTO_ID_MAP[code]: code
+            for code in self.CRYPTO_CURRENCIES
+            if code in self.CRYPTO_ID_MAP
+        }
+        set_field(self, "CRYPTO_ID_TO_CODE", MappingProxyType(id_to_code))
+        set_field(self, "CRYPTO_IDS", tuple(id_to_code))
+
     # Пути к файлам
     @property
     def rates_file_path(self) -> Path:  # noqa: N802
@@ -107,8 +159,8 @@ class ParserConfig:
 
     @property
     def history_file_path(self) -> Path:  # noqa: N802
-        """Путь к файлу exchange_rates.json (исторический журнал)."""
-        return settings.data_dir / "exchange_rates.json"
+        """Путь к файлу exchange_rates.jsonl (исторический журнал)."""
+        return settings.data_dir / "exchange_rates.jsonl"
 
     def validate(self) -> None:
         """
@@ -1,12 +1,40 @@
 """Хранилище для курсов валют."""
 
 import json
+import os
+import sys
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+from valutatrade_hub.core.utils import write_atomic
 from valutatrade_hub.parser_service.config import config
 
+# Множество кодов криптовалют для проверки принадлежности за O(1)
+_CRYPTO_CODES = frozenset(config.CRYPTO_CURRENCIES)
+
+# Общий кодировщик вместо нового JSONEncoder на каждый json.dumps
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+# Кодировщик строк журнала: одна запись — одна строка JSON
+_JSONL_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def utc_timestamp() -> str:
+    """
+    Получить текущее время UTC в формате журнала и кеша курсов.
+
+    Пакетные операции вычисляют метку один раз и передают её
+    во все записи пакета.
+
+    Returns:
+        ISO-метка вида "YYYY-MM-DDTHH:MM:SS.ffffffZ"
+    """
+    return datetime.utcnow().isoformat() + "Z"
+
 
 class RatesStorage:
     """Хранилище для работы с файлами курсов валют."""
@@ -21,16 +49,58 @@ class RatesStorage:
 
         Args:
             rates_file: Путь к файлу rates.json
-            history_file: Путь к файлу exchange_rates.json
+            history_file: Путь к файлу exchange_rates.jsonl
         """
         self.rates_file = rates_file or config.rates_file_path
         self.history_file = history_file or config.history_file_path
+        # Сводка кеша (last_refresh, число пар) рядом с rates.json
+        self.meta_file = self.rates_file.with_name(
+            f"{self.rates_file.stem}_meta.json"
+        )
 
         # Создаём директории, если их нет
         self.rates_file.parent.mkdir(parents=True, exist_ok=True)
         self.history_file.parent.mkdir(parents=True, exist_ok=True)
 
-    def _write_atomic(
+        # Разобранный rates.json: (mtime_ns, размер, данные)
+        self._cache: tuple[int, int, dict[str, Any]] | None = None
+
+        self._migrate_legacy_history()
+
+    def _migrate_legacy_history(self) -> None:
+        """
+        Перенести журнал из старого формата в JSON Lines.
+
+        Журнал раньше хранился одним JSON-документом
+        {"records": [...]} в exchange_rates.json. Если нового файла ещё
+        нет, записи переносятся в него построчно, а старый файл
+        удаляется.
+        """
+        legacy_file = self.history_file.with_suffix(".json")
+        if (
+            legacy_file == self.history_file
+            or self.history_file.exists()
+            or not legacy_file.exists()
+        ):
+            return
+
+        try:
+            records = json.loads(legacy_file.read_bytes()).get(
+                "records", []
+            )
+        except (ValueError, AttributeError):
+            return
+
+        write_atomic(
+            self.history_file,
+            "".join(
+                _JSONL_ENCODER.encode(record) + "\n" for record in records
+            ).encode("utf-8"),
+        )
+
+        legacy_file.unlink()
+
+    def _write_json(
         self, file_path: Path, data: dict[str, Any]
     ) -> None:
         """
@@ -40,20 +110,8 @@ class RatesStorage:
             file_path: Путь к файлу
             data: Данные для записи
         """
-        # Создаём временный файл
-        temp_file = file_path.with_suffix(".tmp")
-
-        try:
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-
-            # Атомарно переименовываем
-            temp_file.replace(file_path)
-        except Exception:
-            # Удаляем временный файл при ошибке
-            if temp_file.exists():
-                temp_file.unlink()
-            raise
+        # Сериализуем целиком и пишем одной операцией
+        write_atomic(file_path, _JSON_ENCODER.encode(data).encode("utf-8"))
 
     def save_rate_to_history(
         self,
@@ -62,9 +120,13 @@ class RatesStorage:
         rate: float,
         source: str,
         meta: dict[str, Any] | None = None,
+        timestamp: str | None = None,
     ) -> str:
         """
-        Сохранить курс в исторический журнал (exchange_rates.json).
+        Сохранить курс в исторический журнал (exchange_rates.jsonl).
+
+        Запись дописывается в конец файла одной строкой — журнал не
+        перечитывается и не переписывается целиком.
 
         Args:
             from_currency: Исходная валюта
@@ -72,104 +134,430 @@ class RatesStorage:
             rate: Курс обмена
             source: Источник курса
             meta: Метаданные (request_ms, status_code и т.д.)
+            timestamp: Метка времени записи (см. utc_timestamp);
+                если не задана, берётся текущее время
 
         Returns:
             ID записи
         """
-        timestamp = datetime.utcnow().isoformat() + "Z"
-        record_id = f"{from_currency}_{to_currency}_{timestamp}"
-
-        record = {
-            "id": record_id,
-            "from_currency": from_currency.upper(),
-            "to_currency": to_currency.upper(),
-            "rate": rate,
-            "timestamp": timestamp,
-            "source": source,
-            "meta": meta or {},
-        }
+        return self.save_rates_to_history_bulk(
+            [(from_currency, to_currency, rate)], source, meta, timestamp
+        )[0]
 
-        # Загружаем существующую историю
-        history = self.load_history()
+    def save_rates_to_history_bulk(
+        self,
+        entries: Iterable[tuple[str, str, float]],
+        source: str,
+        meta: dict[str, Any] | None = None,
+        timestamp: str | None = None,
+    ) -> list[str]:
+        """
+        Сохранить пакет курсов в исторический журнал одной записью.
 
-        # Добавляем новую запись
-        if "records" not in history:
-            history["records"] = []
+        Файл открывается один раз, все строки пакета дописываются
+        одной операцией записи (и одним fsync, если он включён).
 
-        history["records"].append(record)
+        Args:
+            entries: Курсы вида (from_currency, to_currency, rate)
+            source: Источник курсов
+            meta: Метаданные, общие для пакета (request_ms и т.д.)
+            timestamp: Метка времени записей (см. utc_timestamp);
+                если не задана, берётся текущее время
 
-        # Сохраняем
-        self._write_atomic(self.history_file, history)
+        Returns:
+            ID записей в порядке entries
+        """
+        if timestamp is None:
+            timestamp = utc_timestamp()
+        meta = meta or {}
+
+        record_ids: list[str] = []
+        lines: list[str] = []
+        for from_currency, to_currency, rate in entries:
+            record_id = f"{from_currency}_{to_currency}_{timestamp}"
+            record = {
+                "id": record_id,
+                "from_currency": from_currency.upper(),
+                "to_currency": to_currency.upper(),
+                "rate": rate,
+                "timestamp": timestamp,
+                "source": source,
+                "meta": meta,
+            }
+            record_ids.append(record_id)
+            lines.append(_JSONL_ENCODER.encode(record) + "\n")
 
-        return record_id
+        if not lines:
+            return record_ids
+
+        with open(self.history_file, "ab") as f:
+            f.write("".join(lines).encode("utf-8"))
+            if config.HISTORY_FSYNC:
+                os.fsync(f.fileno())
+
+        return record_ids
 
     def save_rates_cache(
         self,
         rates: dict[str, float],
         sources: dict[str, str],
-    ) -> None:
+        full: bool = False,
+    ) -> str:
         """
         Сохранить кеш курсов в rates.json.
 
+        Пары хранятся по столбцам: параллельные списки "pairs",
+        "rates" и "sources" и одна общая метка "updated_at" вместо
+        словаря с повторяющимися полями на каждую пару.
+
         Args:
             rates: Словарь курсов {pair: rate}
             sources: Словарь источников {pair: source}
+            full: Курсы получены от всех источников без ошибок
+                (только такой кеш может заменить полное обновление)
+
+        Returns:
+            Записанная метка last_refresh
         """
-        timestamp = datetime.utcnow().isoformat() + "Z"
+        timestamp = utc_timestamp()
 
-        pairs_data: dict[str, dict[str, Any]] = {}
+        pair_names: list[str] = []
+        pair_rates: list[float] = []
+        pair_sources: list[str] = []
 
         for pair, rate in rates.items():
-            parts = pair.split("_")
-            if len(parts) != 2:
+            if pair.count("_") != 1:
                 continue
 
-            from_curr, to_curr = parts
-            source = sources.get(pair, "Unknown")
+            pair_names.append(pair)
+            pair_rates.append(rate)
+            pair_sources.append(sources.get(pair, "Unknown"))
 
-            pairs_data[pair] = {
-                "rate": rate,
-                "updated_at": timestamp,
-                "source": source,
-            }
+        by_currency, crypto_pairs = self._build_pairs_index(pair_names)
 
         cache_data = {
-            "pairs": pairs_data,
+            "pairs": pair_names,
+            "rates": pair_rates,
+            "sources": pair_sources,
+            "updated_at": timestamp,
             "last_refresh": timestamp,
+            "full_refresh": full,
+            "by_currency": by_currency,
+            "crypto_pairs": crypto_pairs,
         }
 
         # Сохраняем атомарно
-        self._write_atomic(self.rates_file, cache_data)
+        self._write_json(self.rates_file, cache_data)
+
+        # Только что записанные данные сразу становятся кешем чтения
+        cache_data = dict(cache_data)
+        cache_data["pairs"] = self._pairs_from_columns(cache_data)
+        cache_data["_last_refresh_fmt"] = self._format_timestamp(timestamp)
+        file_stat = self.rates_file.stat()
+        self._cache = (
+            file_stat.st_mtime_ns, file_stat.st_size, cache_data
+        )
+
+        # Сводка помнит версию rates.json, для которой она записана:
+        # если файл перезапишет кто-то другой, она станет недействительной
+        self._write_json(
+            self.meta_file,
+            {
+                "last_refresh": timestamp,
+                "total": len(pair_names),
+                "full": full,
+                "rates_mtime_ns": file_stat.st_mtime_ns,
+                "rates_size": file_stat.st_size,
+            },
+        )
+
+        return timestamp
+
+    @staticmethod
+    def _pairs_from_columns(
+        cache_data: dict[str, Any],
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Собрать словарь пар из столбцов кеша.
+
+        Args:
+            cache_data: Данные кеша со столбцами pairs/rates/sources
+                и общей меткой updated_at
+
+        Returns:
+            Словарь {pair: {"rate", "updated_at", "source"}}
+        """
+        pair_names = cache_data.get("pairs", [])
+        pair_rates = cache_data.get("rates", [])
+        pair_sources = cache_data.get("sources") or [
+            "Unknown"
+        ] * len(pair_names)
+        updated_at = cache_data.get("updated_at")
+
+        return {
+            pair: {"rate": rate, "updated_at": updated_at, "source": source}
+            for pair, rate, source in zip(
+                pair_names, pair_rates, pair_sources
+            )
+        }
+
+    @staticmethod
+    def _build_pairs_index(
+        pairs: Iterable[str],
+    ) -> tuple[dict[str, list[str]], list[str]]:
+        """
+        Построить индекс пар по валютам и список крипто-пар.
+
+        Args:
+            pairs: Имена пар (например, ключи словаря пар)
+
+        Returns:
+            Кортеж (by_currency, crypto_pairs), где by_currency —
+            словарь {валюта: [пары с её участием]}
+        """
+        by_currency: dict[str, list[str]] = {}
+        crypto_pairs: list[str] = []
+
+        for pair in pairs:
+            parts = pair.split("_")
+            if len(parts) != 2:
+                continue
+
+            # Коды интернируются: по ним идут поиски в индексе
+            from_curr, to_curr = map(sys.intern, parts)
+            by_currency.setdefault(from_curr, []).append(pair)
+            if to_curr != from_curr:
+                by_currency.setdefault(to_curr, []).append(pair)
+
+            if from_curr in _CRYPTO_CODES:
+                crypto_pairs.append(pair)
+
+        return by_currency, crypto_pairs
+
+    @staticmethod
+    def _format_timestamp(timestamp: str | None) -> str | None:
+        """
+        Преобразовать ISO-метку времени в формат для вывода.
+
+        Args:
+            timestamp: Метка времени в формате ISO (возможно с "Z")
+
+        Returns:
+            Строка вида "YYYY-MM-DD HH:MM:SS", исходная строка,
+            если её не удалось разобрать, или None
+        """
+        if not timestamp:
+            return None
+
+        try:
+            dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except (ValueError, TypeError, AttributeError):
+            return str(timestamp)
+
+    def iter_records(self) -> Iterator[dict[str, Any]]:
+        """
+        Лениво перебрать записи исторического журнала.
+
+        Файл читается построчно, в памяти одновременно находится
+        одна запись. Строки, которые не удалось разобрать (например,
+        оборванная последняя запись), пропускаются.
+
+        Yields:
+            Записи журнала в порядке добавления
+        """
+        try:
+            f = open(self.history_file, "rb")
+        except FileNotFoundError:
+            return
+
+        with f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def tail(self, n: int) -> list[dict[str, Any]]:
+        """
+        Получить последние записи исторического журнала.
+
+        Args:
+            n: Количество записей
+
+        Returns:
+            Не более n последних записей в порядке добавления
+        """
+        if n <= 0:
+            return []
+        return list(deque(self.iter_records(), maxlen=n))
+
+    def load_history_arrays(self, pair: str) -> tuple[array, array]:
+        """
+        Загрузить историю одной пары в виде компактных массивов.
+
+        Значения хранятся в массивах array("d") (8 байт на значение)
+        вместо словарей записей — удобно для агрегаций (среднее,
+        минимум, скользящие окна) по большой истории.
+
+        Args:
+            pair: Пара в формате "FROM_TO" (например, "BTC_USD")
+
+        Returns:
+            Кортеж (unix-время записей, курсы) в порядке добавления;
+            записи с некорректной меткой времени или курсом
+            пропускаются
+        """
+        from_currency, _, to_currency = pair.upper().partition("_")
+        timestamps = array("d")
+        rates = array("d")
+
+        for record in self.iter_records():
+            if (
+                record.get("from_currency") != from_currency
+                or record.get("to_currency") != to_currency
+            ):
+                continue
+            try:
+                timestamp = datetime.fromisoformat(
+                    record["timestamp"].replace("Z", "+00:00")
+                ).timestamp()
+                rate = float(record["rate"])
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+            timestamps.append(timestamp)
+            rates.append(rate)
+
+        return timestamps, rates
 
     def load_history(self) -> dict[str, Any]:
         """
         Загрузить исторический журнал.
 
         Returns:
-            Словарь с историей курсов
+            Словарь {"records": [...]} с историей курсов
+        """
+        return {"records": list(self.iter_records())}
+
+    def load_rates_meta(self) -> dict[str, Any]:
+        """
+        Загрузить сводку кеша курсов без разбора rates.json.
+
+        Метка last_refresh сводки — время последнего обновления курсов
+        самим Parser Service. Core Service тоже перезаписывает
+        rates.json и ставит в нём собственный last_refresh, поэтому
+        сводка, записанная для другой версии файла, строится заново
+        по общей метке "updated_at", которую пишет только
+        save_rates_cache. В кеше без этой метки last_refresh — None.
+
+        Returns:
+            Словарь {"last_refresh": метка или None, "total": число
+            пар, "full": кеш записан полным обновлением}
         """
-        if not self.history_file.exists():
-            return {"records": []}
+        try:
+            file_stat = self.rates_file.stat()
+        except FileNotFoundError:
+            return {"last_refresh": None, "total": 0, "full": False}
 
         try:
-            with open(self.history_file, encoding="utf-8") as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {"records": []}
+            meta = json.loads(self.meta_file.read_bytes())
+        except (FileNotFoundError, ValueError):
+            meta = None
+
+        if (
+            isinstance(meta, dict)
+            and meta.get("rates_mtime_ns") == file_stat.st_mtime_ns
+            and meta.get("rates_size") == file_stat.st_size
+        ):
+            return {
+                "last_refresh": meta.get("last_refresh"),
+                "total": meta.get("total", 0),
+                "full": meta.get("full") is True,
+            }
+
+        cache_data = self.load_rates_cache()
+        updated_at = cache_data.get("updated_at")
+        if not isinstance(updated_at, str):
+            updated_at = None
+        return {
+            "last_refresh": updated_at,
+            "total": len(cache_data.get("pairs", {})),
+            "full": cache_data.get("full_refresh") is True,
+        }
+
+    def get_last_refresh(self) -> str | None:
+        """
+        Получить метку последнего обновления курсов Parser Service.
+
+        Returns:
+            ISO-метка обновления или None, если кеш не записан
+            Parser Service (см. load_rates_meta)
+        """
+        return self.load_rates_meta()["last_refresh"]
 
     def load_rates_cache(self) -> dict[str, Any]:
         """
         Загрузить кеш курсов.
 
         Returns:
-            Словарь с кешем курсов
+            Словарь с кешем курсов: пары — словарем
+            {pair: {"rate", "updated_at", "source"}} независимо от
+            формата файла, индексы by_currency и crypto_pairs,
+            а также отформатированную
+            для вывода метку времени _last_refresh_fmt. Пока файл
+            не меняется, возвращается один и тот же словарь —
+            его нельзя изменять
         """
-        if not self.rates_file.exists():
-            return {"pairs": {}, "last_refresh": None}
+        empty_cache: dict[str, Any] = {
+            "pairs": {},
+            "last_refresh": None,
+            "by_currency": {},
+            "crypto_pairs": [],
+            "_last_refresh_fmt": None,
+        }
+
+        try:
+            file_stat = self.rates_file.stat()
+        except FileNotFoundError:
+            self._cache = None
+            return empty_cache
+
+        # Файл не менялся (те же mtime и размер) — повторно не разбираем
+        cached = self._cache
+        if (
+            cached is not None
+            and cached[0] == file_stat.st_mtime_ns
+            and cached[1] == file_stat.st_size
+        ):
+            return cached[2]
 
         try:
-            with open(self.rates_file, encoding="utf-8") as f:
-                return json.load(f)
+            cache_data = json.loads(self.rates_file.read_bytes())
         except (FileNotFoundError, json.JSONDecodeError):
-            return {"pairs": {}, "last_refresh": None}
+            return empty_cache
+
+        # Пары, сохранённые по столбцам, собираем в словарь один раз
+        # при загрузке (кеш старого формата уже словарь)
+        if isinstance(cache_data.get("pairs"), list):
+            cache_data["pairs"] = self._pairs_from_columns(cache_data)
+
+        # Кеш, записанный до появления индекса, индексируем при чтении
+        if "by_currency" not in cache_data:
+            by_currency, crypto_pairs = self._build_pairs_index(
+                cache_data.get("pairs", {})
+            )
+            cache_data["by_currency"] = by_currency
+            cache_data["crypto_pairs"] = crypto_pairs
+
+        # Разбираем ISO-метку один раз при загрузке
+        cache_data["_last_refresh_fmt"] = self._format_timestamp(
+            cache_data.get("last_refresh")
+        )
+
+        self._cache = (
+            file_stat.st_mtime_ns, file_stat.st_size, cache_data
+        )
+        return cache_data
 
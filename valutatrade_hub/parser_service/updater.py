@@ -1,6 +1,8 @@
 """Основной модуль обновления курсов валют."""
 
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from typing import Any
 
 from valutatrade_hub.logging_config import get_logger
@@ -8,20 +10,52 @@ from valutatrade_hub.parser_service.api_clients import (
     BaseApiClient,
     CoinGeckoClient,
     ExchangeRateApiClient,
+    build_session,
 )
 from valutatrade_hub.parser_service.storage import RatesStorage
 
 logger = get_logger(__name__)
 
+# Относительная точность сравнения курсов с предыдущим обновлением
+_RATE_EPSILON = 1e-12
+
+# Верхняя граница паузы для источника после серии ошибок (секунды)
+_BACKOFF_MAX_SECONDS = 300
+
+
+def _same_rate(rate: float, previous: Any) -> bool:
+    """
+    Проверить, что курс не изменился с предыдущего обновления.
+
+    Args:
+        rate: Новый курс
+        previous: Курс из кеша (может отсутствовать)
+
+    Returns:
+        True, если курсы совпадают с точностью _RATE_EPSILON
+    """
+    if not isinstance(previous, int | float):
+        return False
+    return abs(rate - previous) < _RATE_EPSILON * max(1.0, abs(rate))
+
 
 class RatesUpdater:
-    """Класс для координации обновления курсов валют."""
+    """
+    Класс для координации обновления курсов валют.
+
+    Клиенты, созданные обновлятелем, работают через его собственную
+    HTTP-сессию с пулом соединений. Для периодических обновлений
+    один экземпляр стоит переиспользовать между запусками (соединения
+    остаются открытыми, а недоступный источник опрашивается с
+    растущей паузой) и закрыть через close() или with.
+    """
 
     def __init__(
         self,
         storage: RatesStorage | None = None,
         crypto_client: BaseApiClient | None = None,
         fiat_client: BaseApiClient | None = None,
+        ttl_seconds: int = 60,
     ) -> None:
         """
         Инициализация обновлятеля курсов.
@@ -30,133 +64,278 @@ class RatesUpdater:
             storage: Хранилище для сохранения курсов
             crypto_client: Клиент для криптовалют (CoinGecko)
             fiat_client: Клиент для фиатных валют (ExchangeRate-API)
+            ttl_seconds: Сколько секунд кеш курсов считается свежим
+                и полное обновление не обращается к API
         """
         self.storage = storage or RatesStorage()
-        self.crypto_client = crypto_client or CoinGeckoClient()
+        self.ttl_seconds = ttl_seconds
+        # Предохранитель по источникам: число ошибок подряд и момент
+        # (time.monotonic), до которого источник не опрашивается
+        self._failures: dict[str, int] = {}
+        self._skip_until: dict[str, float] = {}
+        # Долгоживущая сессия: TCP/TLS-соединения переиспользуются
+        # между вызовами run_update
+        self._session = build_session()
+        self.crypto_client = crypto_client or CoinGeckoClient(
+            session=self._session
+        )
         self.fiat_client = fiat_client
 
         # Создаём клиент фиатных валют только если есть ключ
         if self.fiat_client is None:
             try:
-                self.fiat_client = ExchangeRateApiClient()
+                self.fiat_client = ExchangeRateApiClient(
+                    session=self._session
+                )
             except ValueError:
                 logger.warning(
                     "ExchangeRate-API ключ не установлен. "
                     "Фиатные валюты не будут обновляться."
                 )
 
-    def run_update(self, source: str | None = None) -> dict[str, Any]:
+    def close(self) -> None:
+        """Закрыть HTTP-сессию обновлятеля и её соединения."""
+        self._session.close()
+
+    def __enter__(self) -> "RatesUpdater":
+        """Войти в контекст: обновлятель закрывается при выходе."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Выйти из контекста, закрыв HTTP-сессию."""
+        self.close()
+
+    def _providers(self) -> list[tuple[str, BaseApiClient | None, str]]:
         """
-        Запустить обновление курсов валют.
+        Получить список источников курсов.
+
+        Returns:
+            Список (ключ для --source, клиент или None, имя источника)
+            в порядке обработки результатов
+        """
+        return [
+            ("coingecko", self.crypto_client, "CoinGecko"),
+            ("exchangerate", self.fiat_client, "ExchangeRate-API"),
+        ]
+
+    @staticmethod
+    def _fetch_source(
+        client: BaseApiClient | None, label: str
+    ) -> tuple[dict[str, float], int, str | None]:
+        """
+        Получить курсы от одного источника.
+
+        Ошибки источника не выбрасываются, а возвращаются сообщением,
+        чтобы сбой одного API не мешал остальным.
 
         Args:
-            source: Источник для обновления ('coingecko', 'exchangerate'
-                или None для всех)
+            client: Клиент источника (None — клиент недоступен)
+            label: Имя источника для логов и истории
 
         Returns:
-            Словарь с результатами обновления
+            Кортеж (курсы, время запроса в мс, сообщение об ошибке
+            или None)
+        """
+        if client is None:
+            logger.warning(
+                f"{label} клиент недоступен. Пропускаем обновление."
+            )
+            return {}, 0, None
 
-        Raises:
-            ApiRequestError: Если все клиенты не смогли получить данные
+        try:
+            logger.info(f"Fetching from {label}...")
+            start_time = time.perf_counter()
+
+            rates = client.fetch_rates()
+
+            elapsed_ms = int((time.perf_counter() - start_time) * 1000)
+
+            logger.info(
+                f"Fetching from {label}... OK ({len(rates)} rates)"
+            )
+            return rates, elapsed_ms, None
+
+        except Exception as e:
+            error_msg = f"Failed to fetch from {label}: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            return {}, 0, error_msg
+
+    def _record_failure(self, key: str) -> None:
         """
-        logger.info("Starting rates update...")
+        Учесть ошибку источника и назначить паузу перед его опросом.
 
-        all_rates: dict[str, float] = {}
-        all_sources: dict[str, str] = {}
-        errors: list[str] = []
+        Пауза растёт экспоненциально с числом ошибок подряд
+        (2, 4, 8, ... секунд) и ограничена _BACKOFF_MAX_SECONDS.
 
-        # Обновляем криптовалюты
-        if source is None or source.lower() == "coingecko":
-            try:
-                logger.info("Fetching from CoinGecko...")
-                start_time = time.time()
+        Args:
+            key: Ключ источника (см. _providers)
+        """
+        failures = self._failures.get(key, 0) + 1
+        self._failures[key] = failures
+        delay = min(_BACKOFF_MAX_SECONDS, 2 ** min(failures, 16))
+        self._skip_until[key] = time.monotonic() + delay
 
-                crypto_rates = self.crypto_client.fetch_rates()
+    @staticmethod
+    def _cache_age(last_refresh: str | None) -> float | None:
+        """
+        Получить возраст курсов, загруженных Parser Service.
 
-                elapsed_ms = int((time.time() - start_time) * 1000)
+        Учитываются только метки формата utc_timestamp (UTC с
+        суффиксом "Z"), которые пишет сам Parser Service: чужая
+        метка (например, локальное время Core Service) не говорит
+        о свежести данных провайдеров.
 
-                logger.info(
-                    f"Fetching from CoinGecko... OK "
-                    f"({len(crypto_rates)} rates)"
-                )
+        Args:
+            last_refresh: ISO-метка обновления (см.
+                RatesStorage.load_rates_meta)
 
-                # Сохраняем в историю
-                for pair, rate in crypto_rates.items():
-                    parts = pair.split("_")
-                    if len(parts) == 2:
-                        from_curr, to_curr = parts
-                        self.storage.save_rate_to_history(
-                            from_curr,
-                            to_curr,
-                            rate,
-                            "CoinGecko",
-                            meta={
-                                "request_ms": elapsed_ms,
-                                "status_code": 200,
-                            },
-                        )
-
-                all_rates.update(crypto_rates)
-                all_sources.update(
-                    {pair: "CoinGecko" for pair in crypto_rates.keys()}
-                )
+        Returns:
+            Возраст в секундах или None, если метка отсутствует,
+            некорректна или записана не Parser Service
+        """
+        if not isinstance(last_refresh, str):
+            return None
+        if not last_refresh.endswith("Z"):
+            return None
+
+        try:
+            refreshed_at = datetime.fromisoformat(
+                last_refresh[:-1] + "+00:00"
+            )
+        except ValueError:
+            return None
 
-            except Exception as e:
-                error_msg = f"Failed to fetch from CoinGecko: {str(e)}"
-                logger.error(error_msg, exc_info=True)
-                errors.append(error_msg)
+        return time.time() - refreshed_at.timestamp()
 
-        # Обновляем фиатные валюты
-        if source is None or source.lower() == "exchangerate":
-            if self.fiat_client is None:
-                logger.warning(
-                    "ExchangeRate-API клиент недоступен. "
-                    "Пропускаем обновление фиатных валют."
-                )
-            else:
-                try:
-                    logger.info("Fetching from ExchangeRate-API...")
-                    start_time = time.time()
+    def run_update(
+        self, source: str | None = None, force: bool = False
+    ) -> dict[str, Any]:
+        """
+        Запустить обновление курсов валют.
 
-                    fiat_rates = self.fiat_client.fetch_rates()
+        Если полное обновление Parser Service без ошибок прошло менее
+        ttl_seconds назад, новое полное обновление возвращает кеш без
+        обращения к API (запись rates.json из Core Service свежести
+        не продлевает). Запросы к разным источникам независимы и
+        выполняются параллельно; результаты объединяются в вызывающем
+        потоке.
 
-                    elapsed_ms = int((time.time() - start_time) * 1000)
+        Args:
+            source: Источник для обновления ('coingecko', 'exchangerate'
+                или None для всех)
+            force: Обновить курсы, даже если кеш ещё свежий
 
-                    logger.info(
-                        f"Fetching from ExchangeRate-API... OK "
-                        f"({len(fiat_rates)} rates)"
-                    )
+        Returns:
+            Словарь с результатами обновления ("cached": True, если
+            курсы взяты из кеша; "history_writes_skipped" — число
+            неизменившихся пар, не записанных в историю)
+
+        Raises:
+            ApiRequestError: Если все клиенты не смогли получить данные
+        """
+        if source is None and not force:
+            # Для проверки свежести достаточно маленькой сводки кеша.
+            # Кеш после обновления одного источника (или с ошибками)
+            # неполон и полное обновление не заменяет
+            meta = self.storage.load_rates_meta()
+            age = self._cache_age(meta["last_refresh"])
+            if (
+                meta["full"]
+                and age is not None
+                and 0 <= age < self.ttl_seconds
+            ):
+                logger.info(
+                    f"Rates cache hit ({age:.0f}s old), skipping update."
+                )
+                return {
+                    "total_rates": meta["total"],
+                    "last_refresh": meta["last_refresh"],
+                    "errors": None,
+                    "cached": True,
+                }
+
+        logger.info("Starting rates update...")
 
-                    # Сохраняем в историю
-                    for pair, rate in fiat_rates.items():
-                        parts = pair.split("_")
-                        if len(parts) == 2:
-                            from_curr, to_curr = parts
-                            self.storage.save_rate_to_history(
-                                from_curr,
-                                to_curr,
-                                rate,
-                                "ExchangeRate-API",
-                                meta={
-                                    "request_ms": elapsed_ms,
-                                    "status_code": 200,
-                                },
-                            )
-
-                    all_rates.update(fiat_rates)
-                    all_sources.update(
-                        {
-                            pair: "ExchangeRate-API"
-                            for pair in fiat_rates.keys()
-                        }
-                    )  # noqa: E501
-
-                except Exception as e:
-                    error_msg = (
-                        f"Failed to fetch from ExchangeRate-API: {str(e)}"
+        # Курсы предыдущего обновления: неизменившиеся пары
+        # в историю повторно не пишутся
+        previous_pairs = self.storage.load_rates_cache().get("pairs", {})
+
+        all_rates: dict[str, float] = {}
+        all_sources: dict[str, str] = {}
+        errors: list[str] = []
+        history_skipped = 0
+
+        # Источники для обновления: (ключ, клиент, имя источника).
+        # Источник, недавно завершившийся ошибкой, пропускается
+        # до конца паузы, а не ждёт таймаута запроса
+        source_key = source.lower() if source is not None else None
+        now = time.monotonic()
+        tasks = []
+        for key, client, label in self._providers():
+            if source_key is not None and source_key != key:
+                continue
+            if now < self._skip_until.get(key, 0.0):
+                error_msg = (
+                    f"Skipped {label}: backing off after "
+                    f"{self._failures[key]} consecutive failures"
+                )
+                logger.warning(error_msg)
+                errors.append(error_msg)
+                continue
+            tasks.append((key, client, label))
+
+        results = []
+        if tasks:
+            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+                futures = [
+                    (
+                        executor.submit(self._fetch_source, client, label),
+                        key,
+                        label,
                     )
-                    logger.error(error_msg, exc_info=True)
-                    errors.append(error_msg)
+                    for key, client, label in tasks
+                ]
+                results = [
+                    (future.result(), key, source_name)
+                    for future, key, source_name in futures
+                ]
+
+        # Результаты обрабатываются в порядке источников: запись
+        # истории и объединение словарей — в одном потоке
+        for (rates, elapsed_ms, error_msg), key, source_name in results:
+            if error_msg is not None:
+                self._record_failure(key)
+                errors.append(error_msg)
+                continue
+            self._failures.pop(key, None)
+            self._skip_until.pop(key, None)
+
+            # Один проход по парам: записи истории, курсы и источники
+            entries = []
+            for pair, rate in rates.items():
+                all_rates[pair] = rate
+                all_sources[pair] = source_name
+                # partition не создаёт список, в отличие от split
+                from_curr, sep, to_curr = pair.partition("_")
+                if not sep or "_" in to_curr:
+                    continue
+                previous = previous_pairs.get(pair)
+                if previous is not None and _same_rate(
+                    rate, previous.get("rate")
+                ):
+                    history_skipped += 1
+                    continue
+                entries.append((from_curr, to_curr, rate))
+
+            # Сохраняем в историю одним пакетом
+            self.storage.save_rates_to_history_bulk(
+                entries,
+                source_name,
+                meta={
+                    "request_ms": elapsed_ms,
+                    "status_code": 200,
+                },
+            )
 
         # Если нет ни одного курса, выбрасываем исключение
         if not all_rates:
@@ -170,16 +349,20 @@ class RatesUpdater:
         logger.info(
             f"Writing {len(all_rates)} rates to {rates_file_str}..."
         )
-        self.storage.save_rates_cache(all_rates, all_sources)
+        last_refresh = self.storage.save_rates_cache(
+            all_rates,
+            all_sources,
+            full=source_key is None and not errors,
+        )
 
         logger.info("Update successful.")
 
         result = {
             "total_rates": len(all_rates),
-            "last_refresh": self.storage.load_rates_cache().get(
-                "last_refresh"
-            ),
+            "last_refresh": last_refresh,
             "errors": errors if errors else None,
+            "cached": False,
+            "history_writes_skipped": history_skipped,
         }
 
         return result